@@ -0,0 +1,279 @@
+"""Column-oriented cohort analytics over student results."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chatbot.datasets import load_map, load_rows, register_reload_hook, tenant_cache
+
+GROUP_FIELDS: Tuple[str, ...] = ("department", "semester", "subject_code", "academic_year")
+SOURCE_DATASETS = frozenset({"student_results", "students"})
+
+
+def _to_float(value: Optional[str]) -> float:
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros_like(numerator, dtype=float),
+        where=denominator > 0,
+    )
+
+
+@dataclass(frozen=True)
+class ResultsFrame:
+    """``student_results`` joined with ``students``, stored column by column."""
+
+    student_id: np.ndarray
+    department: np.ndarray
+    semester: np.ndarray
+    subject_code: np.ndarray
+    academic_year: np.ndarray
+    grade: np.ndarray
+    marks: np.ndarray
+    total: np.ndarray
+    credits: np.ndarray
+    grade_points: np.ndarray
+    passed: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.student_id)
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+
+@dataclass(frozen=True)
+class GroupedStats:
+    """Per-group aggregates; row ``i`` of every array describes group ``i``."""
+
+    keys: Tuple[str, ...]
+    values: Dict[str, np.ndarray]
+    count: np.ndarray
+    mean_percentage: np.ndarray
+    pass_rate: np.ndarray
+    mean_grade_points: np.ndarray
+    grades: Tuple[str, ...]
+    grade_counts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def take(self, mask: np.ndarray, keys: Sequence[str]) -> "GroupedStats":
+        """Return the groups selected by ``mask`` labelled by ``keys`` only."""
+        return GroupedStats(
+            keys=tuple(keys),
+            values={key: self.values[key][mask] for key in keys},
+            count=self.count[mask],
+            mean_percentage=self.mean_percentage[mask],
+            pass_rate=self.pass_rate[mask],
+            mean_grade_points=self.mean_grade_points[mask],
+            grades=self.grades,
+            grade_counts=self.grade_counts[mask],
+        )
+
+
+@dataclass(frozen=True)
+class Standing:
+    """Where one student sits inside a cohort."""
+
+    student_id: str
+    rank: int
+    cohort_size: int
+    percentage: float
+    percentile: float
+
+
+@tenant_cache
+def load_frame() -> ResultsFrame:
+    """Build the joined column store once per dataset load (cached)."""
+    rows = load_rows("student_results")
+    students = load_map("students", "student_id")
+    return ResultsFrame(
+        student_id=np.array([row["student_id"] for row in rows], dtype=str),
+        department=np.array(
+            [students.get(row["student_id"], {}).get("department") or "Unknown" for row in rows],
+            dtype=str,
+        ),
+        semester=np.array([int(row["semester"]) for row in rows], dtype=int),
+        subject_code=np.array([row["subject_code"] for row in rows], dtype=str),
+        academic_year=np.array([row["academic_year"] for row in rows], dtype=str),
+        grade=np.array([row.get("grade") or "-" for row in rows], dtype=str),
+        marks=np.array([_to_float(row.get("marks_obtained")) for row in rows], dtype=float),
+        total=np.array([_to_float(row.get("total_marks")) for row in rows], dtype=float),
+        credits=np.array([_to_float(row.get("credits")) for row in rows], dtype=float),
+        grade_points=np.array([_to_float(row.get("grade_points")) for row in rows], dtype=float),
+        passed=np.array(
+            [(row.get("result_status") or "").casefold() == "pass" for row in rows], dtype=bool
+        ),
+    )
+
+
+def _group_codes(frame: ResultsFrame, keys: Tuple[str, ...]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Map every row to a dense group id and return the label of each group."""
+    if not keys:
+        return np.zeros(len(frame), dtype=np.intp), {}
+
+    uniques, inverses = [], []
+    for key in keys:
+        unique, inverse = np.unique(frame.column(key), return_inverse=True)
+        uniques.append(unique)
+        inverses.append(inverse.ravel())
+
+    shape = tuple(len(unique) for unique in uniques)
+    flat = np.ravel_multi_index(tuple(inverses), shape)
+    group_ids, codes = np.unique(flat, return_inverse=True)
+    positions = np.unravel_index(group_ids, shape)
+    values = {key: unique[position] for key, unique, position in zip(keys, uniques, positions)}
+    return codes.ravel(), values
+
+
+@tenant_cache
+def grouped_stats(keys: Tuple[str, ...]) -> GroupedStats:
+    """Aggregate every metric for ``keys`` in a single grouped pass (cached)."""
+    unknown = [key for key in keys if key not in GROUP_FIELDS]
+    if unknown:
+        raise KeyError(f"Unknown group field(s): {', '.join(unknown)}")
+
+    frame = load_frame()
+    if not len(frame):
+        empty = np.zeros(0)
+        return GroupedStats(
+            keys=keys,
+            values={key: np.array([], dtype=str) for key in keys},
+            count=np.zeros(0, dtype=int),
+            mean_percentage=empty,
+            pass_rate=empty,
+            mean_grade_points=empty,
+            grades=(),
+            grade_counts=np.zeros((0, 0), dtype=int),
+        )
+
+    codes, values = _group_codes(frame, keys)
+    size = int(codes.max()) + 1
+
+    count = np.bincount(codes, minlength=size)
+    marks = np.bincount(codes, weights=frame.marks, minlength=size)
+    total = np.bincount(codes, weights=frame.total, minlength=size)
+    passed = np.bincount(codes, weights=frame.passed.astype(float), minlength=size)
+    credits = np.bincount(codes, weights=frame.credits, minlength=size)
+    weighted_points = np.bincount(codes, weights=frame.grade_points * frame.credits, minlength=size)
+
+    grades, grade_codes = np.unique(frame.grade, return_inverse=True)
+    grade_codes = grade_codes.ravel()
+    grade_counts = np.bincount(
+        codes * len(grades) + grade_codes, minlength=size * len(grades)
+    ).reshape(size, len(grades))
+
+    # Best grade first: order grade labels by the highest grade points they carry.
+    best_points = np.zeros(len(grades))
+    np.maximum.at(best_points, grade_codes, frame.grade_points)
+    order = np.argsort(-best_points, kind="stable")
+
+    return GroupedStats(
+        keys=keys,
+        values=values,
+        count=count,
+        mean_percentage=_ratio(marks, total) * 100,
+        pass_rate=_ratio(passed, count.astype(float)) * 100,
+        mean_grade_points=_ratio(weighted_points, credits),
+        grades=tuple(str(grade) for grade in grades[order]),
+        grade_counts=grade_counts[:, order],
+    )
+
+
+def _filter_mask(columns: Dict[str, np.ndarray], size: int, filters: Dict[str, object]) -> np.ndarray:
+    mask = np.ones(size, dtype=bool)
+    for field, wanted in filters.items():
+        column = columns[field]
+        if field == "semester":
+            mask &= column == int(wanted)
+        else:
+            mask &= np.char.lower(column.astype(str)) == str(wanted).strip().lower()
+    return mask
+
+
+def _active_filters(filters: Dict[str, object]) -> Dict[str, object]:
+    active = {field: value for field, value in filters.items() if value not in (None, "")}
+    unknown = [field for field in active if field not in GROUP_FIELDS]
+    if unknown:
+        raise KeyError(f"Unknown filter field(s): {', '.join(unknown)}")
+    return active
+
+
+def summarize(group_by: Sequence[str], **filters: object) -> GroupedStats:
+    """Return grouped aggregates for ``group_by`` restricted to ``filters``.
+
+    Filtered fields are folded into the cached grouping so each filter just
+    selects whole groups instead of rescanning the rows.
+    """
+    active = _active_filters(filters)
+    keys = tuple(field for field in GROUP_FIELDS if field in group_by or field in active)
+    stats = grouped_stats(keys)
+    mask = _filter_mask(stats.values, len(stats), active)
+    return stats.take(mask, [field for field in keys if field in group_by])
+
+
+def student_standing(student_id: str, **filters: object) -> Optional[Standing]:
+    """Rank a student by overall percentage within the filtered cohort."""
+    frame = load_frame()
+    mask = _filter_mask(
+        {field: frame.column(field) for field in filters if field in GROUP_FIELDS},
+        len(frame),
+        _active_filters(filters),
+    )
+    if not mask.any():
+        return None
+
+    ids, codes = np.unique(frame.student_id[mask], return_inverse=True)
+    codes = codes.ravel()
+    scores = _ratio(
+        np.bincount(codes, weights=frame.marks[mask], minlength=len(ids)),
+        np.bincount(codes, weights=frame.total[mask], minlength=len(ids)),
+    ) * 100
+
+    position = np.flatnonzero(ids == student_id)
+    if not len(position):
+        return None
+    own = scores[position[0]]
+    return Standing(
+        student_id=student_id,
+        rank=int((scores > own).sum()) + 1,
+        cohort_size=len(ids),
+        percentage=float(own),
+        percentile=float((scores <= own).mean() * 100),
+    )
+
+
+def clear_cache() -> None:
+    """Drop the column store and every cached grouping."""
+    load_frame.cache_clear()
+    grouped_stats.cache_clear()
+
+
+@register_reload_hook
+def _on_reload(names: FrozenSet[str]) -> None:
+    if names & SOURCE_DATASETS:
+        clear_cache()
+
+
+__all__ = [
+    "GROUP_FIELDS",
+    "GroupedStats",
+    "ResultsFrame",
+    "Standing",
+    "clear_cache",
+    "grouped_stats",
+    "load_frame",
+    "student_standing",
+    "summarize",
+]
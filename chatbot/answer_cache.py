@@ -0,0 +1,318 @@
+"""Near-duplicate answer cache that sits in front of the runner.
+
+Questions are normalized, then split into entity tokens and wording.
+Entities are everything that is not generic query wording: subject codes,
+semesters and other numbers, departments, subject names, student IDs. They
+must match exactly and form part of the scope key. Only the wording is
+compared fuzzily. It is split into character shingles and summarized with
+a MinHash signature, LSH banding finds candidate entries, and the exact
+shingle Jaccard decides the hit. Everything runs locally.
+
+Entries carry the datasets their tool calls read and are dropped when any of
+those datasets reloads. A turn is only cached when every tool argument
+appears in the question itself. Otherwise it relied on earlier turns and
+would be wrong for anyone else asking the same words. For the same reason a
+turn is refused when the answer, or the session so far, names a student the
+question does not: the answer may be personal even though the tool call was
+not. Scopes are per tenant, so campuses never share answers.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from chatbot.configs import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_TTL_SECONDS,
+    STUDENT_ID_PATTERN,
+)
+from chatbot.datasets import current_tenant, register_reload_hook
+from chatbot.tools import DATE_DEPENDENT_TOOLS, TOOL_DATASETS
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+PUBLIC_SCOPE = "public"
+
+_PRIME = (1 << 31) - 1
+_RNG = np.random.default_rng(20241118)
+_HASH_A = _RNG.integers(1, _PRIME, size=NUM_PERM, dtype=np.int64)
+_HASH_B = _RNG.integers(0, _PRIME, size=NUM_PERM, dtype=np.int64)
+
+STOPWORDS = frozenset(
+    "a an the is are was were be of for to in on at please can could you tell me i my "
+    "show give get about do does will".split()
+)
+# Phrases folded to one token before splitting, so department names compare as one entity.
+PHRASES: Tuple[Tuple[str, str], ...] = (
+    (r"\bcomputer science( (and )?engineering)?\b|\bcse?\b", "computerscience"),
+    (r"\bmechanical( engineering)?\b", "mechanicalengineering"),
+    (r"\belectrical( (and )?electronics)?( engineering)?\b|\beee?\b", "electricalengineering"),
+    (r"\bcivil( engineering)?\b", "civilengineering"),
+    (r"\binformation technology\b", "informationtechnology"),
+)
+SYNONYMS: Dict[str, str] = {
+    "midterm": "exam",
+    "midsem": "exam",
+    "endterm": "exam",
+    "endsem": "exam",
+    "examination": "exam",
+    "test": "exam",
+    "sem": "semester",
+    "marks": "result",
+    "mark": "result",
+    "grade": "result",
+    "professor": "faculty",
+    "prof": "faculty",
+    "teacher": "faculty",
+    "first": "1",
+    "second": "2",
+    "third": "3",
+    "fourth": "4",
+    "fifth": "5",
+    "sixth": "6",
+    "seventh": "7",
+    "eighth": "8",
+}
+# Generic query wording; every other token is an entity that must match exactly.
+WORDING = frozenset(
+    "when what where which who how many much time date day days exam timetable schedule class "
+    "lecture result paper previous past old question faculty room free available holiday event "
+    "calendar upcoming next last this week month today tomorrow list all semester section "
+    "department dept year subject course office hour contact email phone detail info information "
+    "and or with from by start end held scheduled happen happening venue hall location sgpa cgpa "
+    "rank average pass rate percentage my our any some there".split()
+)
+
+ToolCall = Tuple[str, Mapping[str, object]]
+
+
+def normalize(query: str) -> str:
+    """Lowercase, fold contractions, synonyms and department names, drop filler words."""
+    text = query.casefold().replace("'s", " is").replace("-", "")
+    for pattern, replacement in PHRASES:
+        text = re.sub(pattern, replacement, text)
+    tokens = []
+    for token in re.sub(r"[^a-z0-9]+", " ", text).split():
+        if token in STOPWORDS:
+            continue
+        token = re.sub(r"^(\d+)(st|nd|rd|th)$", r"\1", token)
+        if len(token) > 4 and token.endswith("s") and not token.endswith(("ss", "us")):
+            token = token[:-1]
+        tokens.append(SYNONYMS.get(token, token))
+    return " ".join(tokens)
+
+
+def split_entities(normalized: str) -> Tuple[Tuple[str, ...], str]:
+    """Split a normalized question into sorted entity tokens and the remaining wording."""
+    tokens = normalized.split()
+    entities = tuple(sorted({token for token in tokens if token not in WORDING}))
+    wording = " ".join(token for token in tokens if token in WORDING)
+    return entities, wording
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    padded = f" {text} "
+    if len(padded) <= SHINGLE_SIZE:
+        return frozenset({padded})
+    return frozenset(padded[index : index + SHINGLE_SIZE] for index in range(len(padded) - SHINGLE_SIZE + 1))
+
+
+def signature(items: Iterable[str]) -> np.ndarray:
+    """MinHash signature with ``NUM_PERM`` universal hash functions."""
+    values = np.array([zlib.crc32(item.encode("utf-8")) & _PRIME for item in items], dtype=np.int64)
+    return ((np.outer(_HASH_A, values) + _HASH_B[:, None]) % _PRIME).min(axis=1)
+
+
+def student_ids(query: str) -> Tuple[str, ...]:
+    return tuple(sorted({match.upper() for match in STUDENT_ID_PATTERN.findall(query)}))
+
+
+def _jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    return len(left & right) / len(left | right) if left or right else 1.0
+
+
+@dataclass
+class CachedAnswer:
+    tenant: str
+    scope: str
+    normalized: str
+    shingles: FrozenSet[str]
+    bands: Tuple[bytes, ...]
+    response: str
+    datasets: FrozenSet[str]
+    created: float
+
+
+class AnswerCache:
+    """LRU store of final answers keyed by near-duplicate question match."""
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_SIMILARITY,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, bytes], Set[int]] = defaultdict(set)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _scope(entities: Sequence[str]) -> str:
+        return f"{current_tenant()}:{' '.join(entities) or PUBLIC_SCOPE}"
+
+    @staticmethod
+    def _bands(sig: np.ndarray) -> Tuple[bytes, ...]:
+        return tuple(
+            sig[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND].tobytes() for band in range(BANDS)
+        )
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for band, key in enumerate(entry.bands):
+            bucket = self._buckets.get((entry.scope, band, key))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[(entry.scope, band, key)]
+
+    def lookup(self, query: str) -> Optional[str]:
+        """Return a stored answer for a near-duplicate question, if any."""
+        normalized = normalize(query)
+        entities, wording = split_entities(normalized)
+        scope = self._scope(entities)
+        items = shingles(wording)
+        bands = self._bands(signature(items))
+        now = time.monotonic()
+
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(bands):
+                candidates |= self._buckets.get((scope, band, key), set())
+
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.evictions += 1
+                    continue
+                score = _jaccard(items, entry.shingles)
+                if score >= self.threshold and score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].response
+
+    def store(
+        self, query: str, response: str, tool_calls: Sequence[ToolCall], history: Iterable[str] = ()
+    ) -> bool:
+        """Cache ``response`` if the turn is safe to replay; return whether it was stored.
+
+        ``history`` holds the session's earlier messages.
+        """
+        if not response or not tool_calls:
+            return False
+        asked = set(student_ids(query))
+        if any(set(student_ids(text)) - asked for text in (response, *history)):
+            return False
+
+        normalized = normalize(query)
+        mentioned = set(normalized.split())
+        datasets: Set[str] = set()
+        for name, args in tool_calls:
+            if name not in TOOL_DATASETS or name in DATE_DEPENDENT_TOOLS:
+                return False
+            for value in args.values():
+                # Flags and omitted arguments carry no context from earlier turns.
+                if value is None or isinstance(value, bool):
+                    continue
+                if not set(normalize(str(value)).split()) <= mentioned:
+                    return False
+            datasets |= TOOL_DATASETS[name]
+
+        entities, wording = split_entities(normalized)
+        items = shingles(wording)
+        entry = CachedAnswer(
+            tenant=current_tenant(),
+            scope=self._scope(entities),
+            normalized=normalized,
+            shingles=items,
+            bands=self._bands(signature(items)),
+            response=response,
+            datasets=frozenset(datasets),
+            created=time.monotonic(),
+        )
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for band, key in enumerate(entry.bands):
+                self._buckets[(entry.scope, band, key)].add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate(self, datasets: Iterable[str]) -> int:
+        """Drop the current tenant's entries whose answer read one of ``datasets``."""
+        names = frozenset(datasets)
+        tenant_id = current_tenant()
+        with self._lock:
+            stale = [
+                entry_id
+                for entry_id, entry in self._entries.items()
+                if entry.tenant == tenant_id and entry.datasets & names
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.evictions += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+ANSWER_CACHE = AnswerCache()
+
+
+@register_reload_hook
+def _on_reload(names: FrozenSet[str]) -> None:
+    ANSWER_CACHE.invalidate(names)
+
+
+__all__ = ["ANSWER_CACHE", "AnswerCache", "CachedAnswer", "normalize", "signature", "split_entities", "student_ids"]
@@ -0,0 +1,199 @@
+"""Room and faculty occupancy index built from ``timetable.csv``.
+
+Each (room or faculty, weekday) pair owns an integer bitset with one bit per
+``SLOT_MINUTES`` slot between ``DAY_START`` and ``DAY_END``. Free-slot and
+clash checks are then single bitwise operations.
+
+There is one index per tenant. Dataset tables are replaced rather than
+mutated on reload, so a changed ``timetable`` table identity is enough to
+trigger an incremental ``sync``.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from chatbot.datasets import load_rows, tenant_cache
+
+SLOT_MINUTES = 30
+DAY_START = 8 * 60
+DAY_END = 20 * 60
+SLOT_COUNT = (DAY_END - DAY_START) // SLOT_MINUTES
+FULL_DAY = (1 << SLOT_COUNT) - 1
+WEEK_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday")
+
+ROOM = "room"
+FACULTY = "faculty"
+
+Owner = Tuple[str, str, str]  # (kind, casefolded name, casefolded day)
+RowKey = Tuple[Tuple[str, str], ...]
+
+
+def _minutes(value: str) -> int:
+    hours, _, minutes = value.strip().partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def _format_minutes(value: int) -> str:
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+def slot_mask(start_time: str, end_time: str) -> int:
+    """Return the bitset covering ``start_time``–``end_time`` (HH:MM, 24h)."""
+    first = max(0, (_minutes(start_time) - DAY_START) // SLOT_MINUTES)
+    last = min(SLOT_COUNT, -(-(_minutes(end_time) - DAY_START) // SLOT_MINUTES))
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def mask_windows(mask: int) -> List[Tuple[str, str]]:
+    """Split a bitset into contiguous (start, end) time windows."""
+    windows = []
+    slot = 0
+    while slot < SLOT_COUNT:
+        if mask >> slot & 1:
+            begin = slot
+            while slot < SLOT_COUNT and mask >> slot & 1:
+                slot += 1
+            windows.append(
+                (
+                    _format_minutes(DAY_START + begin * SLOT_MINUTES),
+                    _format_minutes(DAY_START + slot * SLOT_MINUTES),
+                )
+            )
+        else:
+            slot += 1
+    return windows
+
+
+def _row_key(row: Dict[str, str]) -> RowKey:
+    return tuple(sorted(row.items()))
+
+
+class OccupancyIndex:
+    """Bitset per room and per faculty member per weekday.
+
+    ``sync`` diffs the current timetable rows against the rows already indexed
+    and only recomputes the owners those rows touch.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Counter = Counter()
+        self._contributions: Dict[Owner, Counter] = defaultdict(Counter)
+        self._masks: Dict[Owner, int] = {}
+        self._names: Dict[Tuple[str, str], str] = {}
+        self._name_refs: Counter = Counter()
+        self._lock = threading.Lock()
+        self.source: Optional[List[Dict[str, str]]] = None
+
+    @staticmethod
+    def _owners(row: Dict[str, str]) -> Iterable[Tuple[str, str]]:
+        if row.get("room_number"):
+            yield ROOM, row["room_number"]
+        if row.get("faculty_name"):
+            yield FACULTY, row["faculty_name"]
+
+    def sync(self, rows: Iterable[Dict[str, str]]) -> int:
+        """Bring the index in line with ``rows``; return how many owners changed."""
+        with self._lock:
+            current = Counter(_row_key(row) for row in rows)
+            added = current - self._rows
+            removed = self._rows - current
+            touched = set()
+
+            for delta, sign in ((removed, -1), (added, 1)):
+                for key, times in delta.items():
+                    row = dict(key)
+                    mask = slot_mask(row["start_time"], row["end_time"])
+                    day = row["day_of_week"].casefold()
+                    for kind, name in self._owners(row):
+                        owner = (kind, name.casefold(), day)
+                        self._names[(kind, name.casefold())] = name
+                        self._name_refs[(kind, name.casefold())] += sign * times
+                        self._contributions[owner][mask] += sign * times
+                        touched.add(owner)
+
+            for owner in touched:
+                contributions = +self._contributions.pop(owner)
+                combined = 0
+                for mask in contributions:
+                    combined |= mask
+                if contributions:
+                    self._contributions[owner] = contributions
+                    self._masks[owner] = combined
+                else:
+                    self._masks.pop(owner, None)
+
+            for name_key in [key for key, refs in self._name_refs.items() if refs <= 0]:
+                del self._name_refs[name_key]
+                del self._names[name_key]
+
+            self._rows = current
+            return len(touched)
+
+    # Readers take the lock too: sync runs on the tool pool while other
+    # sessions query, and iterating a dict it resizes would raise.
+    def names(self, kind: str) -> List[str]:
+        with self._lock:
+            return sorted(name for (owner_kind, _), name in self._names.items() if owner_kind == kind)
+
+    def match(self, kind: str, query: str) -> List[str]:
+        """Return display names of ``kind`` whose name contains ``query``."""
+        needle = query.strip().casefold()
+        return [name for name in self.names(kind) if needle in name.casefold()]
+
+    def busy(self, kind: str, name: str, day: str) -> int:
+        with self._lock:
+            return self._masks.get((kind, name.casefold(), day.strip().casefold()), 0)
+
+    def is_free(self, kind: str, name: str, day: str, window: int) -> bool:
+        return not self.busy(kind, name, day) & window
+
+    def free_windows(self, kind: str, name: str, day: str) -> List[Tuple[str, str]]:
+        return mask_windows(FULL_DAY & ~self.busy(kind, name, day))
+
+    def free_rooms(self, day: str, window: int) -> List[str]:
+        return [room for room in self.names(ROOM) if self.is_free(ROOM, room, day, window)]
+
+    def conflicts(self) -> List[Tuple[str, str, str]]:
+        """Owners double-booked on some day, as (kind, name, day)."""
+        clashes = []
+        with self._lock:
+            for (kind, key, day), contributions in sorted(self._contributions.items()):
+                seen = 0
+                for mask, times in contributions.items():
+                    if times > 1 or seen & mask:
+                        clashes.append((kind, self._names[(kind, key)], day.title()))
+                        break
+                    seen |= mask
+        return clashes
+
+
+@tenant_cache
+def _tenant_index() -> OccupancyIndex:
+    return OccupancyIndex()
+
+
+def get_occupancy_index() -> OccupancyIndex:
+    """Return the current tenant's index, syncing it if the timetable changed."""
+    index = _tenant_index()
+    rows = load_rows("timetable")
+    if index.source is not rows:
+        index.sync(rows)
+        index.source = rows
+    return index
+
+
+__all__ = [
+    "FACULTY",
+    "ROOM",
+    "SLOT_MINUTES",
+    "WEEK_DAYS",
+    "OccupancyIndex",
+    "get_occupancy_index",
+    "mask_windows",
+    "slot_mask",
+]
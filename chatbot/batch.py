@@ -0,0 +1,252 @@
+"""Offline report generation for the whole student body.
+
+Run after a results declaration::
+
+    python -m chatbot.batch --output reports/
+
+Students are streamed from ``students.csv`` and its deltas, latest row per
+student as in ``load_map``, in chunks and fanned out over a process pool. Each report holds the ``check_student_results`` summary and the
+``get_class_timetable`` output for the student's next semester; no model is
+called. Reports go to a gzip-compressed JSONL file, one gzip member per
+finished chunk, or to one JSON file per student. A rerun skips students that
+are already written, so an interrupted run picks up where it stopped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Add parent directory so imports keep working when run directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from chatbot.configs import BASE_DIR, DEFAULT_TENANT
+from chatbot.datasets import current_tenant, stream_rows, use_tenant
+from chatbot.tools import check_student_results, get_class_timetable
+
+CHUNK_SIZE = 200
+REPORT_FORMATS = ("jsonl", "files")
+TIMETABLE_MODES = ("next", "current", "none")
+
+Report = Dict[str, object]
+Progress = Callable[[int, int], None]
+
+
+def student_report(student: Dict[str, str], timetable: str = "next", timetables: Optional[Dict] = None) -> Report:
+    """Build one student's report from the existing tools."""
+    semester = int(student["semester"])
+    report: Report = {
+        "student_id": student["student_id"],
+        "name": student.get("name"),
+        "department": student.get("department"),
+        "semester": semester,
+        "section": student.get("section"),
+        "results": check_student_results(student["student_id"]),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    if timetable != "none":
+        target = semester + 1 if timetable == "next" else semester
+        key = (student["department"], target, student.get("section"))
+        # Whole sections share a timetable, so render it once per chunk.
+        cache = timetables if timetables is not None else {}
+        if key not in cache:
+            cache[key] = get_class_timetable(department=key[0], semester=target, section=key[2])
+        report["timetable_semester"] = target
+        report["timetable"] = cache[key]
+    return report
+
+
+def _report_chunk(tenant_id: str, students: Sequence[Dict[str, str]], timetable: str) -> List[Report]:
+    with use_tenant(tenant_id):
+        timetables: Dict[Tuple[str, int, Optional[str]], str] = {}
+        return [student_report(student, timetable, timetables) for student in students]
+
+
+class JsonlWriter:
+    """Append reports to ``reports.jsonl.gz`` with a manifest for resuming.
+
+    Each chunk is one gzip member. The manifest line for a chunk is written
+    only after its member is on disk, and records where the member ends, so
+    a half-written member from a crash is cut off on the next run.
+    """
+
+    def __init__(self, directory: Path, resume: bool = True) -> None:
+        self.path = directory / "reports.jsonl.gz"
+        self.manifest = directory / "reports.manifest"
+        self.done: Set[str] = set()
+        if not resume:
+            for path in (self.path, self.manifest):
+                path.unlink(missing_ok=True)
+        self._recover()
+
+    def _recover(self) -> None:
+        end = 0
+        entries = []
+        if self.manifest.exists():
+            size = self.path.stat().st_size if self.path.exists() else 0
+            for line in self.manifest.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn last line
+                if entry["end"] > size:
+                    break
+                entries.append(entry)
+                end = entry["end"]
+                self.done.update(entry["students"])
+        with self.path.open("ab") as handle:
+            handle.truncate(end)
+        self.manifest.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+
+    def write(self, reports: Sequence[Report]) -> None:
+        payload = "".join(json.dumps(report, ensure_ascii=False) + "\n" for report in reports)
+        with self.path.open("ab") as handle:
+            handle.write(gzip.compress(payload.encode("utf-8")))
+            handle.flush()
+            os.fsync(handle.fileno())
+            end = handle.tell()
+        students = [str(report["student_id"]) for report in reports]
+        with self.manifest.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"end": end, "students": students}) + "\n")
+        self.done.update(students)
+
+
+class FileWriter:
+    """Write one ``<student_id>.json`` per student; existing files count as done."""
+
+    def __init__(self, directory: Path, resume: bool = True) -> None:
+        self.directory = directory
+        self.done: Set[str] = {path.stem for path in directory.glob("*.json")} if resume else set()
+
+    @staticmethod
+    def _file_name(student_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_-]", "_", student_id) + ".json"
+
+    def write(self, reports: Sequence[Report]) -> None:
+        for report in reports:
+            path = self.directory / self._file_name(str(report["student_id"]))
+            temp_path = path.with_name(f".{path.name}.tmp")
+            temp_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(temp_path, path)
+            self.done.add(path.stem)
+
+
+def _chunks(students: Iterator[Dict[str, str]], done: Set[str], size: int) -> Iterator[List[Dict[str, str]]]:
+    chunk: List[Dict[str, str]] = []
+    for student in students:
+        if student.get("student_id") and student["student_id"] not in done:
+            chunk.append(student)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_reports(
+    output: Path,
+    report_format: str = "jsonl",
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    timetable: str = "next",
+    resume: bool = True,
+    progress: Optional[Progress] = None,
+) -> Dict[str, int]:
+    """Write reports for every student of the current tenant; return counts.
+
+    ``workers=1`` runs inline. Otherwise at most two chunks per worker are in
+    flight, so memory stays flat however large ``students.csv`` is.
+    """
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format '{report_format}'")
+    if timetable not in TIMETABLE_MODES:
+        raise ValueError(f"Unknown timetable mode '{timetable}'")
+
+    output.mkdir(parents=True, exist_ok=True)
+    writer = JsonlWriter(output, resume) if report_format == "jsonl" else FileWriter(output, resume)
+    total = sum(1 for _ in stream_rows("students", "student_id"))
+    skipped = len(writer.done)
+    written = 0
+    tenant_id = current_tenant()
+
+    def _record(reports: List[Report]) -> None:
+        nonlocal written
+        writer.write(reports)
+        written += len(reports)
+        if progress:
+            progress(skipped + written, total)
+
+    chunks = _chunks(stream_rows("students", "student_id"), set(writer.done), chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for chunk in chunks:
+            _record(_report_chunk(tenant_id, chunk, timetable))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: Set[Future] = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_report_chunk, tenant_id, chunk, timetable))
+                if len(pending) >= 2 * workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        _record(future.result())
+            for future in wait(pending).done:
+                _record(future.result())
+
+    return {"total": total, "written": written, "skipped": skipped}
+
+
+def _print_progress(started: float) -> Progress:
+    def _show(done: int, total: int) -> None:
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        print(f"\r  {done}/{total} students ({rate:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+    return _show
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Generate result and timetable reports for every student."""
+    parser = argparse.ArgumentParser(description="Generate Academate reports for the whole student body.")
+    parser.add_argument("--output", type=Path, default=None, help="Output directory (default: reports/<tenant>).")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="jsonl", help="Compressed JSONL or one file per student.")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Students per work item.")
+    parser.add_argument("--timetable", choices=TIMETABLE_MODES, default="next", help="Which semester's timetable to include.")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant (campus) to report on.")
+    parser.add_argument("--restart", action="store_true", help="Ignore earlier output instead of resuming.")
+    args = parser.parse_args(argv)
+
+    output = args.output or BASE_DIR / "reports" / args.tenant
+    started = time.perf_counter()
+    with use_tenant(args.tenant):
+        counts = generate_reports(
+            output,
+            report_format=args.format,
+            workers=args.workers,
+            chunk_size=max(1, args.chunk_size),
+            timetable=args.timetable,
+            resume=not args.restart,
+            progress=_print_progress(started),
+        )
+    print(file=sys.stderr)
+    print(
+        f"Wrote {counts['written']} report(s), skipped {counts['skipped']} already done, "
+        f"{counts['total']} students in {time.perf_counter() - started:.1f}s -> {output}"
+    )
+    return 0
+
+
+__all__ = ["FileWriter", "JsonlWriter", "generate_reports", "student_report"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import os
+import re
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -15,9 +16,40 @@ load_dotenv(ENV_FILE if ENV_FILE.exists() else None, override=True)
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# Roll numbers such as CS2024001; shared by the cascade validator and answer-cache scoping.
+STUDENT_ID_PATTERN = re.compile(r"\b[A-Za-z]{2,4}\d{5,}\b")
+
+# The default tenant reads DATA_DIR; other campuses live in TENANT_DATA_ROOT/<tenant_id>.
+DEFAULT_TENANT = "default"
+TENANT_ID = os.getenv("ACADEMATE_TENANT", DEFAULT_TENANT)
+TENANT_DATA_ROOT = Path(os.getenv("TENANT_DATA_ROOT", str(BASE_DIR / "tenants")))
+TENANT_MEMORY_BUDGET_MB = float(os.getenv("TENANT_MEMORY_BUDGET_MB", "512"))
+
 MODEL_NAME = os.getenv("AGENT_MODEL", "gemini-2.5-flash-lite")
+# Comma-separated, cheapest first, e.g. "gemini-2.5-flash-lite,gemini-2.5-flash".
+MODEL_CASCADE = [name.strip() for name in os.getenv("AGENT_MODEL_CASCADE", "").split(",") if name.strip()]
+CASCADE_COMPLEXITY_THRESHOLD = int(os.getenv("CASCADE_COMPLEXITY_THRESHOLD", "2"))
 TEMPERATURE = float(os.getenv("AGENT_TEMPERATURE", "0.7"))
 
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.75"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "4"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "45"))
+
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "15"))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_THREAD_WORKERS = int(os.getenv("TOOL_THREAD_WORKERS", "8"))
+TOOL_PROCESS_WORKERS = int(os.getenv("TOOL_PROCESS_WORKERS", "0"))
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in {"1", "true", "yes"}
+PREFETCH_MAX_CALLS = int(os.getenv("PREFETCH_MAX_CALLS", "2"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "300"))
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", "256"))
+
 SYSTEM_INSTRUCTION = """You are Academate, a plain-spoken college assistant.
 
 Focus on these jobs:
@@ -1,13 +1,39 @@
-"""Lightweight CSV data access helpers for Academate."""
+"""Lightweight CSV data access helpers for Academate.
+
+Besides the base CSV files, each dataset may have append-only delta files
+named ``<dataset>.delta-<tag>.csv`` (for example
+``student_results.delta-2024-05-15.csv``). Deltas are applied in file-name
+order on first load and by ``apply_deltas`` afterwards, so a results release
+only parses the new rows. ``compact`` folds them back into the base file and
+records which deltas it folded, so other workers holding those rows keep them.
+Write delta files under a temporary name and rename them into place so a
+half-written file is never picked up.
+
+Every call reads the datasets of the current tenant (campus). The tenant is
+held in a context variable, see ``use_tenant``. The default tenant reads
+``configs.DATA_DIR``; any other tenant reads ``TENANT_DATA_ROOT/<tenant_id>``.
+Tenants load lazily on first use. Once the estimated footprint of loaded
+tenants exceeds ``TENANT_MEMORY_BUDGET_MB``, the least recently used ones are
+dropped.
+"""
 
 from __future__ import annotations
 
+import argparse
 import csv
-from functools import lru_cache
+import functools
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 from pathlib import Path
-from typing import Dict, List
+from typing import IO, Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from chatbot.configs import DATA_DIR
+from chatbot.configs import DATA_DIR, DEFAULT_TENANT, TENANT_DATA_ROOT, TENANT_MEMORY_BUDGET_MB
 
 DATASETS: Dict[str, str] = {
     "students": "students.csv",
@@ -19,40 +45,539 @@ DATASETS: Dict[str, str] = {
     "student_results": "student_results.csv",
 }
 
+Row = Dict[str, str]
+ReloadHook = Callable[[FrozenSet[str]], None]
+_RELOAD_HOOKS: List[ReloadHook] = []
+
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+# Parsed rows take several times their CSV size once they are Python dicts.
+MEMORY_PER_FILE_BYTE = 8
+
+_CURRENT_TENANT: ContextVar[str] = ContextVar("academate_tenant", default=DEFAULT_TENANT)
+
+
+class TenantStore:
+    """Cached tables, indexes and derived data for one tenant.
+
+    Tables are replaced, never mutated, so readers holding an old list or map
+    keep a consistent snapshot while deltas are applied.
+    """
+
+    def __init__(self, tenant_id: str, data_dir: Path) -> None:
+        self.tenant_id = tenant_id
+        self.data_dir = data_dir
+        self.rows: Dict[str, List[Row]] = {}
+        self.maps: Dict[Tuple[str, str], Dict[str, Row]] = {}
+        self.groups: Dict[Tuple[str, str], Dict[str, List[Row]]] = {}
+        self.applied: Dict[str, List[str]] = {}
+        self.stamps: Dict[str, Tuple[int, int]] = {}
+        self.file_bytes: Dict[str, int] = {}
+        self.derived: Dict[Any, Dict[tuple, Any]] = {}
+        self.lock = threading.RLock()
+
+    @property
+    def estimated_bytes(self) -> int:
+        return sum(self.file_bytes.values()) * MEMORY_PER_FILE_BYTE
+
+
+_STORES: "OrderedDict[str, TenantStore]" = OrderedDict()
+_STORES_LOCK = threading.Lock()
+
+
+def current_tenant() -> str:
+    """Return the tenant whose datasets calls in this context read."""
+    return _CURRENT_TENANT.get()
+
+
+def set_tenant(tenant_id: str) -> Token:
+    """Switch the current context to ``tenant_id``; returns a token for reset."""
+    tenant_data_dir(tenant_id)
+    return _CURRENT_TENANT.set(tenant_id)
+
+
+@contextmanager
+def use_tenant(tenant_id: Optional[str]) -> Iterator[str]:
+    """Run a block against ``tenant_id`` (the default tenant when ``None``)."""
+    token = set_tenant(tenant_id or DEFAULT_TENANT)
+    try:
+        yield current_tenant()
+    finally:
+        _CURRENT_TENANT.reset(token)
+
+
+def run_for_tenant(tenant_id: str, func: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    """Call ``func(**kwargs)`` as ``tenant_id``; picklable, so pools can run it."""
+    with use_tenant(tenant_id):
+        return func(**kwargs)
+
+
+def tenant_data_dir(tenant_id: str) -> Path:
+    """Resolve a tenant ID to its data directory."""
+    if tenant_id == DEFAULT_TENANT:
+        return DATA_DIR
+    if not TENANT_ID_PATTERN.match(tenant_id or ""):
+        raise KeyError(f"Invalid tenant '{tenant_id}'")
+    path = TENANT_DATA_ROOT / tenant_id
+    if not path.is_dir():
+        raise KeyError(f"Unknown tenant '{tenant_id}'")
+    return path
+
+
+def _store(tenant_id: Optional[str] = None) -> TenantStore:
+    tenant_id = tenant_id or current_tenant()
+    with _STORES_LOCK:
+        store = _STORES.get(tenant_id)
+        if store is None:
+            store = TenantStore(tenant_id, tenant_data_dir(tenant_id))
+            _STORES[tenant_id] = store
+        _STORES.move_to_end(tenant_id)
+        return store
+
+
+def _enforce_budget(keep: str) -> None:
+    budget = TENANT_MEMORY_BUDGET_MB * 1024 * 1024
+    with _STORES_LOCK:
+        total = sum(store.estimated_bytes for store in _STORES.values())
+        for tenant_id in list(_STORES):
+            if total <= budget:
+                break
+            if tenant_id == keep:
+                continue
+            total -= _STORES.pop(tenant_id).estimated_bytes
+
+
+def evict_tenant(tenant_id: str) -> bool:
+    """Drop a tenant's tables and derived data; it reloads lazily on next use."""
+    with _STORES_LOCK:
+        return _STORES.pop(tenant_id, None) is not None
+
+
+def loaded_tenants() -> Dict[str, int]:
+    """Return loaded tenants, least recently used first, with estimated bytes."""
+    with _STORES_LOCK:
+        return {tenant_id: store.estimated_bytes for tenant_id, store in _STORES.items()}
+
+
+def tenant_cache(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Memoize ``func`` per tenant, like ``lru_cache(maxsize=None)``.
+
+    Results live in the tenant's store, so they go away with its datasets.
+    ``func.cache_clear()`` clears the current tenant only.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args: Any) -> Any:
+        cache = _store().derived.setdefault(func, {})
+        try:
+            return cache[args]
+        except KeyError:
+            value = func(*args)
+            cache[args] = value
+            return value
+
+    def cache_clear() -> None:
+        store = _STORES.get(current_tenant())
+        if store is not None:
+            store.derived.pop(func, None)
+
+    wrapper.cache_clear = cache_clear  # type: ignore[attr-defined]
+    return wrapper
+
 
 def dataset_path(name: str) -> Path:
-    """Return the on-disk path for a dataset name."""
+    """Return the on-disk path for a dataset name in the current tenant."""
     if name not in DATASETS:
         raise KeyError(f"Unknown dataset '{name}'")
-    return DATA_DIR / DATASETS[name]
+    return _store().data_dir / DATASETS[name]
+
+
+def delta_paths(name: str) -> List[Path]:
+    """Return the delta files for a dataset in the order they apply."""
+    path = dataset_path(name)
+    return sorted(path.parent.glob(f"{path.stem}.delta-*{path.suffix}"))
+
+
+def _clean(row: Row) -> Row:
+    return {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()}
+
+
+def _read_csv(path: Path) -> List[Row]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        return [_clean(row) for row in csv.DictReader(handle)]
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _folded_marker(name: str) -> Path:
+    path = dataset_path(name)
+    return path.with_name(f".{path.name}.compacted")
 
 
-@lru_cache(maxsize=None)
-def load_rows(name: str) -> List[Dict[str, str]]:
-    """Load a dataset as a list of dictionaries (cached)."""
+def _compaction_record(name: str) -> Path:
+    path = dataset_path(name)
+    return path.with_name(f".{path.name}.folded")
+
+
+def _adopt_compaction(store: TenantStore, name: str, stamp: Tuple[int, int]) -> bool:
+    """Take over a compaction that folded exactly the deltas this store applied.
+
+    The rows are the same, only now in the base file, so the loaded tables,
+    maps and derived data stay and no reload hook fires.
+    """
+    try:
+        record = json.loads(_compaction_record(name).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return False
+    if (
+        tuple(record["from"]) != store.stamps.get(name)
+        or tuple(record["to"]) != stamp
+        or set(record["deltas"]) != set(store.applied.get(name, ()))
+    ):
+        return False
+    store.applied[name] = []
+    store.stamps[name] = stamp
+    return True
+
+
+def _live_deltas(name: str, stamp: Tuple[int, int]) -> List[Path]:
+    """Return delta files not already folded into the base file with ``stamp``.
+
+    ``compact`` lists the deltas it folds in a marker written before the new
+    base file. A base file at least as new as the marker already holds them,
+    even while the delta files are still on disk.
+    """
+    deltas = delta_paths(name)
+    marker = _folded_marker(name)
+    try:
+        if marker.stat().st_mtime_ns > stamp[0]:
+            return deltas
+        folded = set(marker.read_text(encoding="utf-8").split())
+    except FileNotFoundError:
+        return deltas
+    return [path for path in deltas if path.name not in folded]
+
+
+def _load(store: TenantStore, name: str) -> List[Row]:
     path = dataset_path(name)
     if not path.exists():
         raise FileNotFoundError(f"Dataset missing: {path}")
 
-    with path.open(newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        return [
-            {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()}
-            for row in reader
-        ]
+    while True:
+        stamp = _stamp(path)
+        rows = _read_csv(path)
+        applied = []
+        size = stamp[1]
+        try:
+            for delta in _live_deltas(name, stamp):
+                rows.extend(_read_csv(delta))
+                applied.append(delta.name)
+                size += delta.stat().st_size
+        except FileNotFoundError:
+            continue  # compacted while reading; start over from the new base
+        if _stamp(path) == stamp:
+            break
+
+    store.rows[name] = rows
+    store.applied[name] = applied
+    store.stamps[name] = stamp
+    store.file_bytes[name] = size
+    for map_key in [key for key in store.maps if key[0] == name]:
+        del store.maps[map_key]
+    for group_key in [key for key in store.groups if key[0] == name]:
+        del store.groups[group_key]
+    return rows
+
+
+def load_rows(name: str) -> List[Row]:
+    """Load a dataset (base file plus deltas) as a list of dictionaries (cached)."""
+    store = _store()
+    rows = store.rows.get(name)
+    if rows is None:
+        with store.lock:
+            rows = store.rows.get(name)
+            if rows is None:
+                rows = _load(store, name)
+        _enforce_budget(keep=store.tenant_id)
+    return rows
 
 
-@lru_cache(maxsize=None)
-def load_map(name: str, key_field: str) -> Dict[str, Dict[str, str]]:
+def load_map(name: str, key_field: str) -> Dict[str, Row]:
     """Load a dataset indexed by a specific field (cached)."""
+    store = _store()
+    cached = store.maps.get((name, key_field))
+    if cached is not None:
+        return cached
     rows = load_rows(name)
-    return {row[key_field]: row for row in rows if key_field in row}
+    with store.lock:
+        cached = store.maps.get((name, key_field))
+        if cached is None:
+            cached = {row[key_field]: row for row in rows if key_field in row}
+            store.maps[(name, key_field)] = cached
+        return cached
+
+
+def load_groups(name: str, key_field: str) -> Dict[str, List[Row]]:
+    """Load a dataset as lists of rows sharing ``key_field``, in file order (cached)."""
+    store = _store()
+    cached = store.groups.get((name, key_field))
+    if cached is not None:
+        return cached
+    rows = load_rows(name)
+    with store.lock:
+        cached = store.groups.get((name, key_field))
+        if cached is None:
+            cached = {}
+            for row in rows:
+                if key_field in row:
+                    cached.setdefault(row[key_field], []).append(row)
+            store.groups[(name, key_field)] = cached
+        return cached
+
+
+def _open_snapshot(name: str) -> List[IO[str]]:
+    """Open the base file and its live deltas as one consistent set.
+
+    Open handles keep reading the same files even if a compaction replaces
+    the base file or unlinks the deltas meanwhile.
+    """
+    path = dataset_path(name)
+    while True:
+        stamp = _stamp(path)
+        handles: List[IO[str]] = []
+        try:
+            for file_path in [path, *_live_deltas(name, stamp)]:
+                handles.append(file_path.open(newline="", encoding="utf-8"))
+        except FileNotFoundError:
+            pass  # compacted while opening; start over from the new base
+        else:
+            opened = os.fstat(handles[0].fileno())
+            if (opened.st_mtime_ns, opened.st_size) == stamp:
+                return handles
+        for handle in handles:
+            handle.close()
+
+
+def stream_rows(name: str, key_field: Optional[str] = None) -> Iterator[Row]:
+    """Yield a dataset's rows (base file, then live deltas) without caching them.
+
+    With ``key_field``, only the last row for each key is yielded, as in
+    ``load_map``. That takes two passes over the files and keeps one
+    position per key in memory, not the rows.
+    """
+    handles = _open_snapshot(name)
+    try:
+        if key_field is None:
+            for handle in handles:
+                yield from (_clean(row) for row in csv.DictReader(handle))
+            return
+
+        latest: Dict[str, int] = {}
+        position = 0
+        for handle in handles:
+            for row in csv.DictReader(handle):
+                if row.get(key_field) is not None:
+                    latest[row[key_field].strip()] = position
+                position += 1
+        keep = set(latest.values())
+
+        position = 0
+        for handle in handles:
+            handle.seek(0)
+            for row in csv.DictReader(handle):
+                if position in keep:
+                    yield _clean(row)
+                position += 1
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def register_reload_hook(hook: ReloadHook) -> ReloadHook:
+    """Call ``hook`` with the reloaded dataset names whenever caches reset.
+
+    Hooks run in the context of the affected tenant, so ``current_tenant()``
+    inside a hook names it.
+    """
+    _RELOAD_HOOKS.append(hook)
+    return hook
+
+
+def _notify(names: FrozenSet[str]) -> None:
+    if names:
+        for hook in list(_RELOAD_HOOKS):
+            hook(names)
+
+
+def apply_deltas(names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Append unseen delta files to loaded datasets; return rows added per dataset.
+
+    Datasets that are not loaded yet are skipped because their first load
+    picks up every delta anyway. If another worker compacted the base file
+    in the meantime, its record of the fold is enough when it folded exactly
+    the deltas applied here; otherwise that dataset is reloaded in full.
+    """
+    store = _store()
+    added: Dict[str, int] = {}
+    with store.lock:
+        for name in list(names or store.rows):
+            if name not in store.rows:
+                continue
+            stamp = _stamp(dataset_path(name))
+            if stamp != store.stamps.get(name) and not _adopt_compaction(store, name, stamp):
+                previous = len(store.rows[name])
+                added[name] = len(_load(store, name)) - previous
+                continue
+
+            seen = set(store.applied[name])
+            fresh = [path for path in _live_deltas(name, store.stamps[name]) if path.name not in seen]
+            if not fresh:
+                continue
+
+            new_rows = [row for path in fresh for row in _read_csv(path)]
+            store.rows[name] = store.rows[name] + new_rows
+            store.applied[name] = store.applied[name] + [path.name for path in fresh]
+            store.file_bytes[name] += sum(path.stat().st_size for path in fresh)
+            for (map_name, key_field), mapping in list(store.maps.items()):
+                if map_name == name:
+                    updated = dict(mapping)
+                    updated.update((row[key_field], row) for row in new_rows if key_field in row)
+                    store.maps[(map_name, key_field)] = updated
+            for (group_name, key_field), grouping in list(store.groups.items()):
+                if group_name == name:
+                    updated_groups = dict(grouping)
+                    for row in new_rows:
+                        if key_field in row:
+                            key = row[key_field]
+                            updated_groups[key] = updated_groups.get(key, []) + [row]
+                    store.groups[(group_name, key_field)] = updated_groups
+            added[name] = len(new_rows)
+
+    _notify(frozenset(added))
+    return added
+
+
+def compact(names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Fold delta files into their base CSV; return delta files removed per dataset.
+
+    Run this from a single scheduled job; workers notice the rewritten base
+    file on their next ``apply_deltas`` call. The fold is recorded next to
+    the base file, so workers that had applied the same deltas only update
+    their bookkeeping.
+    """
+    store = _store()
+    folded: Dict[str, int] = {}
+    reloaded = set()
+    selected = list(names or DATASETS)
+    with store.lock:
+        # Loaded tables must hold every delta before the bookkeeping is reset.
+        apply_deltas(selected)
+        for name in selected:
+            path = dataset_path(name)
+            base_stamp = _stamp(path)
+            deltas = _live_deltas(name, base_stamp)
+            leftovers = [delta for delta in delta_paths(name) if delta not in deltas]
+            if not deltas:
+                continue
+
+            with path.open(newline="", encoding="utf-8") as handle:
+                fieldnames = next(csv.reader(handle), [])
+            rows = _read_csv(path) + [row for delta in deltas for row in _read_csv(delta)]
+
+            # The marker goes first so that a base file newer than it tells
+            # readers to skip these deltas until they are unlinked.
+            marker = _folded_marker(name)
+            marker_temp = marker.with_name(f"{marker.name}.tmp")
+            marker_temp.write_text("".join(f"{delta.name}\n" for delta in deltas + leftovers), encoding="utf-8")
+            os.replace(marker_temp, marker)
+
+            temp_path = path.with_name(f".{path.name}.compacting")
+            with temp_path.open("w", newline="", encoding="utf-8") as handle:
+                writer = csv.DictWriter(handle, fieldnames=fieldnames, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(temp_path, path)
+
+            # Lets other workers that applied the same deltas keep their
+            # tables instead of reparsing the new base file.
+            record = _compaction_record(name)
+            record_temp = record.with_name(f"{record.name}.tmp")
+            record_temp.write_text(
+                json.dumps({"from": base_stamp, "to": _stamp(path), "deltas": [delta.name for delta in deltas]}),
+                encoding="utf-8",
+            )
+            os.replace(record_temp, record)
+            for delta in deltas + leftovers:
+                delta.unlink(missing_ok=True)
+            marker.unlink()
+
+            if name in store.rows:
+                if set(store.applied[name]) == {delta.name for delta in deltas}:
+                    # Same rows, now all in the base file: keep the tables, reset bookkeeping.
+                    store.applied[name] = []
+                    store.stamps[name] = _stamp(path)
+                else:
+                    # A delta landed after apply_deltas above; pick it up from the new base.
+                    _load(store, name)
+                    reloaded.add(name)
+            folded[name] = len(deltas)
+    _notify(frozenset(reloaded))
+    return folded
 
 
 def clear_cache() -> None:
-    """Reset cached datasets; handy for tests."""
-    load_rows.cache_clear()
-    load_map.cache_clear()
+    """Reset cached datasets for every tenant; handy for tests."""
+    with _STORES_LOCK:
+        tenants = set(_STORES) | {DEFAULT_TENANT}
+        _STORES.clear()
+    for tenant_id in sorted(tenants):
+        token = _CURRENT_TENANT.set(tenant_id)
+        try:
+            _notify(frozenset(DATASETS))
+        finally:
+            _CURRENT_TENANT.reset(token)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Fold delta files into the base CSVs (meant for a periodic job)."""
+    parser = argparse.ArgumentParser(description="Compact Academate dataset delta files.")
+    parser.add_argument("datasets", nargs="*", help="Dataset names (default: all).")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="Tenant (campus) to compact.")
+    args = parser.parse_args(argv)
+
+    with use_tenant(args.tenant):
+        folded = compact(args.datasets or None)
+    for name, count in folded.items():
+        print(f"{name}: folded {count} delta file(s)")
+    if not folded:
+        print("No delta files to compact.")
+    return 0
+
+
+__all__ = [
+    "load_rows",
+    "load_map",
+    "load_groups",
+    "stream_rows",
+    "apply_deltas",
+    "compact",
+    "clear_cache",
+    "register_reload_hook",
+    "delta_paths",
+    "DATASETS",
+    "dataset_path",
+    "current_tenant",
+    "evict_tenant",
+    "loaded_tenants",
+    "run_for_tenant",
+    "set_tenant",
+    "tenant_cache",
+    "tenant_data_dir",
+    "use_tenant",
+]
 
 
-__all__ = ["load_rows", "load_map", "clear_cache", "DATASETS", "dataset_path"]
+if __name__ == "__main__":
+    sys.exit(main())
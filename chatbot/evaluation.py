@@ -8,9 +8,12 @@ from typing import Callable, List
 from chatbot.tools import (
     check_student_results,
     fetch_previous_papers,
+    find_free_slots,
     get_academic_calendar,
     get_class_timetable,
+    get_cohort_analytics,
     get_faculty_info,
+    get_my_exams,
     query_exam_schedule,
 )
 
@@ -59,6 +62,21 @@ def run_evaluations() -> dict:
             run=lambda: fetch_previous_papers("CS301", years=3),
             expected_substrings=["2023", "CS301"],
         ),
+        EvalCase(
+            name="Cohort Analytics",
+            run=lambda: get_cohort_analytics(student_id="CS2024001", group_by="semester"),
+            expected_substrings=["Pass Rate", "rank"],
+        ),
+        EvalCase(
+            name="Free Slots",
+            run=lambda: find_free_slots("Tuesday", "14:00", "16:00"),
+            expected_substrings=["Free Rooms", "CS-102"],
+        ),
+        EvalCase(
+            name="My Exams",
+            run=lambda: get_my_exams("CS2024001", include_past=True),
+            expected_substrings=["CS301", "Hall A"],
+        ),
     ]
 
     summary = {}
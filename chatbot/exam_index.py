@@ -0,0 +1,161 @@
+"""Precomputed student-to-exam join and exam clash detection.
+
+Every student is joined once with the exam rows for their department and
+semester, plus the papers of any subject they still have a backlog in, so a
+personal exam list is a single dictionary lookup.
+
+Run ``python -m chatbot.exam_index`` after a schedule change to print the
+clash report for the whole student body.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from chatbot.datasets import load_rows, register_reload_hook, tenant_cache, use_tenant
+
+SOURCE_DATASETS = frozenset({"students", "exam_schedule", "student_results"})
+
+
+@dataclass(frozen=True)
+class ExamEntry:
+    """One exam a student has to sit."""
+
+    row: Dict[str, str]
+    starts: datetime
+    ends: datetime
+    backlog: bool = False
+
+    @property
+    def label(self) -> str:
+        return f"{self.row['subject_name']} ({self.row['subject_code']})"
+
+
+@dataclass(frozen=True)
+class Clash:
+    """Two exams of one student that overlap or fall on the same day."""
+
+    student_id: str
+    first: ExamEntry
+    second: ExamEntry
+    kind: str  # "overlap" or "back-to-back"
+
+
+def _entry(row: Dict[str, str], backlog: bool = False) -> ExamEntry:
+    starts = datetime.strptime(f"{row['exam_date']} {row['exam_time']}", "%Y-%m-%d %H:%M")
+    minutes = int(row.get("duration_minutes") or 0)
+    return ExamEntry(row=row, starts=starts, ends=starts + timedelta(minutes=minutes), backlog=backlog)
+
+
+@tenant_cache
+def load_exam_index() -> Dict[str, Tuple[ExamEntry, ...]]:
+    """Join students with exam_schedule (and backlog results) once (cached)."""
+    by_group: Dict[Tuple[str, int, str], List[Dict[str, str]]] = defaultdict(list)
+    by_subject: Dict[Tuple[str, str], List[Dict[str, str]]] = defaultdict(list)
+    for row in load_rows("exam_schedule"):
+        year = row.get("academic_year", "")
+        by_group[(row["department"].casefold(), int(row["semester"]), year)].append(row)
+        by_subject[(row["subject_code"].casefold(), year)].append(row)
+
+    # Only the latest attempt counts: a failed paper cleared later is no backlog.
+    latest: Dict[Tuple[str, str], Tuple[Tuple[str, int], bool]] = {}
+    for row in load_rows("student_results"):
+        key = (row["student_id"], row["subject_code"].casefold())
+        attempt = (row.get("declared_date") or "", int(row.get("semester") or 0))
+        if key not in latest or attempt >= latest[key][0]:
+            latest[key] = (attempt, (row.get("result_status") or "").casefold() == "pass")
+    backlogs: Dict[str, set] = defaultdict(set)
+    for (student_id, code), (_, passed) in latest.items():
+        if not passed:
+            backlogs[student_id].add(code)
+
+    index: Dict[str, Tuple[ExamEntry, ...]] = {}
+    for student in load_rows("students"):
+        year = student.get("academic_year", "")
+        regular = by_group.get((student["department"].casefold(), int(student["semester"]), year), [])
+        entries = [_entry(row) for row in regular]
+        taken = {row["subject_code"].casefold() for row in regular}
+        for code in sorted(backlogs.get(student["student_id"], ())):
+            if code in taken:
+                continue
+            entries.extend(_entry(row, backlog=True) for row in by_subject.get((code, year), []))
+        entries.sort(key=lambda entry: (entry.starts, entry.row["subject_code"]))
+        index[student["student_id"]] = tuple(entries)
+    return index
+
+
+def exams_for(student_id: str) -> Optional[Tuple[ExamEntry, ...]]:
+    """Return a student's exams in date order, or ``None`` for unknown IDs."""
+    return load_exam_index().get(student_id)
+
+
+def find_clashes(student_id: str, entries: Sequence[ExamEntry]) -> List[Clash]:
+    """Report overlapping and same-day exam pairs for one student."""
+    clashes = []
+    for position, first in enumerate(entries):
+        for second in entries[position + 1 :]:
+            if second.starts.date() != first.starts.date():
+                break
+            kind = "overlap" if second.starts < first.ends else "back-to-back"
+            clashes.append(Clash(student_id, first, second, kind))
+    return clashes
+
+
+def clash_report() -> List[Clash]:
+    """Find clashes for every student of the current tenant.
+
+    Runs inline: each student's list is already sorted, so the scan takes
+    microseconds and building the join dominates. Worker processes would each
+    rebuild the join and ship full rows back, which only makes it slower.
+    """
+    index = load_exam_index()
+    return [clash for student_id in sorted(index) for clash in find_clashes(student_id, index[student_id])]
+
+
+def clear_cache() -> None:
+    """Drop the precomputed join."""
+    load_exam_index.cache_clear()
+
+
+@register_reload_hook
+def _on_reload(names: FrozenSet[str]) -> None:
+    if names & SOURCE_DATASETS:
+        clear_cache()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Print the cohort-wide clash report; exit code 1 when clashes exist."""
+    parser = argparse.ArgumentParser(description="Report exam clashes for every student.")
+    parser.add_argument("--tenant", default=None, help="Tenant (campus) to check (default: the default tenant).")
+    args = parser.parse_args(argv)
+
+    with use_tenant(args.tenant):
+        clashes = clash_report()
+        students = len(load_exam_index())
+    for clash in clashes:
+        print(
+            f"{clash.student_id}: {clash.kind} – {clash.first.label} at "
+            f"{clash.first.starts:%d %b %H:%M} and {clash.second.label} at {clash.second.starts:%d %b %H:%M}"
+        )
+    print(f"{len(clashes)} clash(es) across {students} students.")
+    return 1 if clashes else 0
+
+
+__all__ = [
+    "Clash",
+    "ExamEntry",
+    "clash_report",
+    "clear_cache",
+    "exams_for",
+    "find_clashes",
+    "load_exam_index",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
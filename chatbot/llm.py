@@ -2,11 +2,243 @@
 
 from __future__ import annotations
 
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Sequence
+
+from google.adk.models.base_llm import BaseLlm
 from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field, PrivateAttr
+
+from chatbot.configs import (
+    CASCADE_COMPLEXITY_THRESHOLD,
+    MODEL_CASCADE,
+    MODEL_NAME,
+    RETRY_CONFIG,
+    STUDENT_ID_PATTERN,
+)
+
+# Phrases that usually mean several lookups or some reasoning over them.
+COMPLEX_MARKERS = (
+    "compare",
+    "difference",
+    "versus",
+    " vs ",
+    "why",
+    "explain",
+    "both",
+    "and also",
+    "plan",
+    "better",
+    "rank",
+)
+# Questions mentioning these almost always need a tool call to answer.
+DATA_KEYWORDS = (
+    "exam",
+    "timetable",
+    "schedule",
+    "result",
+    "marks",
+    "sgpa",
+    "grade",
+    "faculty",
+    "professor",
+    "prof.",
+    "paper",
+    "calendar",
+    "holiday",
+    "room",
+    "free",
+    "average",
+    "pass rate",
+)
+
+Validator = Callable[[LlmRequest, Sequence[LlmResponse]], Optional[str]]
+
+
+def last_user_text(llm_request: LlmRequest) -> str:
+    """Return the latest typed user message in the request, if any."""
+    for content in reversed(llm_request.contents):
+        if content.role != "user" or not content.parts:
+            continue
+        text = " ".join(part.text for part in content.parts if part.text)
+        if text:
+            return text
+    return ""
+
+
+def tool_rounds(llm_request: LlmRequest) -> int:
+    """Count function responses since the latest typed user message."""
+    rounds = 0
+    for content in reversed(llm_request.contents):
+        parts = content.parts or []
+        if any(part.function_response for part in parts):
+            rounds += 1
+        elif content.role == "user" and any(part.text for part in parts):
+            break
+    return rounds
+
+
+def estimate_complexity(llm_request: LlmRequest) -> int:
+    """Cheap score of how much reasoning the current turn needs."""
+    text = f" {last_user_text(llm_request).casefold()} "
+    score = sum(marker in text for marker in COMPLEX_MARKERS)
+    if len(text.split()) > 25:
+        score += 1
+    if text.count("?") > 1:
+        score += 1
+    if tool_rounds(llm_request) >= 2:
+        score += 1
+    return score
+
+
+def _final_responses(responses: Sequence[LlmResponse]) -> List[LlmResponse]:
+    complete = [response for response in responses if not response.partial]
+    return complete or list(responses)
+
+
+def require_content(llm_request: LlmRequest, responses: Sequence[LlmResponse]) -> Optional[str]:
+    """Fail empty or errored answers."""
+    final = _final_responses(responses)
+    if any(response.error_code for response in final):
+        return "error"
+    if not any(response.content and response.content.parts for response in final):
+        return "empty"
+    return None
+
+
+def require_tool_call(llm_request: LlmRequest, responses: Sequence[LlmResponse]) -> Optional[str]:
+    """Fail a direct answer to a data question that should have called a tool."""
+    if not llm_request.tools_dict or tool_rounds(llm_request):
+        return None
+    text = last_user_text(llm_request).casefold()
+    if not (STUDENT_ID_PATTERN.search(text) or any(keyword in text for keyword in DATA_KEYWORDS)):
+        return None
+    for response in _final_responses(responses):
+        parts = response.content.parts if response.content and response.content.parts else []
+        if any(part.function_call for part in parts):
+            return None
+    return "missing_tool_call"
+
+
+DEFAULT_VALIDATORS: List[Validator] = [require_content, require_tool_call]
+
+
+@dataclass
+class CascadeStats:
+    """Per-tier call counts, latency and escalations."""
+
+    requests: int = 0
+    calls: Counter = field(default_factory=Counter)
+    latency: Counter = field(default_factory=Counter)
+    escalations: Counter = field(default_factory=Counter)
+    reasons: Counter = field(default_factory=Counter)
+
+    def record(self, model: str, seconds: float) -> None:
+        self.calls[model] += 1
+        self.latency[model] += seconds
+
+    def snapshot(self) -> Dict[str, object]:
+        escalated = sum(self.escalations.values())
+        return {
+            "requests": self.requests,
+            "escalation_rate": escalated / self.requests if self.requests else 0.0,
+            "escalations": dict(self.escalations),
+            "reasons": dict(self.reasons),
+            "tiers": {
+                model: {"calls": count, "avg_latency_s": self.latency[model] / count}
+                for model, count in self.calls.items()
+            },
+        }
+
+
+class CascadeLlm(BaseLlm):
+    """Try cheaper models first and escalate when a cheap check fails.
+
+    ``tiers`` run from cheapest to largest. Turns scoring at least
+    ``complexity_threshold`` (see ``estimate_complexity``) skip the first
+    tier. Lower tiers are buffered so their answer can be validated before
+    anything is yielded; the last tier streams straight through.
+    """
+
+    tiers: List[BaseLlm]
+    complexity_threshold: int = CASCADE_COMPLEXITY_THRESHOLD
+    validators: List[Validator] = Field(default_factory=lambda: list(DEFAULT_VALIDATORS))
+    _stats: CascadeStats = PrivateAttr(default_factory=CascadeStats)
+
+    @property
+    def stats(self) -> CascadeStats:
+        return self._stats
+
+    def route(self, llm_request: LlmRequest) -> int:
+        """Return the index of the tier this request starts on."""
+        if len(self.tiers) > 1 and estimate_complexity(llm_request) >= self.complexity_threshold:
+            return 1
+        return 0
+
+    def validate(self, llm_request: LlmRequest, responses: Sequence[LlmResponse]) -> Optional[str]:
+        for validator in self.validators:
+            reason = validator(llm_request, responses)
+            if reason:
+                return reason
+        return None
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self._stats.requests += 1
+        first = self.route(llm_request)
+        for position in range(first, len(self.tiers)):
+            tier = self.tiers[position]
+            request = llm_request.model_copy(
+                update={"model": tier.model, "contents": list(llm_request.contents)}
+            )
+            started = time.perf_counter()
+
+            if position == len(self.tiers) - 1:
+                async for response in tier.generate_content_async(request, stream=stream):
+                    yield response
+                self._stats.record(tier.model, time.perf_counter() - started)
+                return
+
+            try:
+                responses = [response async for response in tier.generate_content_async(request, stream=stream)]
+                reason = self.validate(llm_request, responses)
+            except Exception:  # rate limits, timeouts: the next tier may still answer
+                responses, reason = [], "error"
+            self._stats.record(tier.model, time.perf_counter() - started)
+
+            if reason is None:
+                for response in responses:
+                    yield response
+                return
+            self._stats.escalations[tier.model] += 1
+            self._stats.reasons[reason] += 1
+
+
+def build_gemini(model: str = MODEL_NAME) -> Gemini:
+    """Return a single Gemini client configured for the project."""
+    return Gemini(model=model, retry_options=RETRY_CONFIG)
+
 
-from chatbot.configs import MODEL_NAME, RETRY_CONFIG
+def build_llm(models: Optional[Sequence[str]] = None) -> BaseLlm:
+    """Return a Gemini client, or a cascade when several models are configured."""
+    names = list(models if models is not None else MODEL_CASCADE) or [MODEL_NAME]
+    if len(names) == 1:
+        return build_gemini(names[0])
+    return CascadeLlm(model="cascade:" + ">".join(names), tiers=[build_gemini(name) for name in names])
 
 
-def build_llm() -> Gemini:
-    """Return a Gemini client configured for the project."""
-    return Gemini(model=MODEL_NAME, retry_options=RETRY_CONFIG)
+__all__ = [
+    "CascadeLlm",
+    "CascadeStats",
+    "DEFAULT_VALIDATORS",
+    "build_gemini",
+    "build_llm",
+    "estimate_complexity",
+    "require_content",
+    "require_tool_call",
+]
@@ -6,7 +6,7 @@ import sys
 # Add parent directory so imports keep working when run directly
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from chatbot.configs import MODEL_NAME, TEMPERATURE
+from chatbot.configs import MODEL_CASCADE, MODEL_NAME, TEMPERATURE
 from chatbot.runtime import run_cli
 
 
@@ -21,7 +21,7 @@ def main():
     print("\n" + "="*60)
     print("ACADEMATE - College Helper")
     print("="*60)
-    print(f"\n Model: {MODEL_NAME}")
+    print(f"\n Model: {' > '.join(MODEL_CASCADE) or MODEL_NAME}")
     print(f"Temperature: {TEMPERATURE}")
     print("Agent ready")
     print("\n Ask me about:")
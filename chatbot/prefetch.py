@@ -0,0 +1,252 @@
+"""Speculative prefetch of likely tool results from session context.
+
+Once a session has mentioned a student ID, the next questions are usually
+about that student's timetable, results or exams. ``Prefetcher.prefetch``
+starts those tool calls in a small background pool while the model is still
+deciding what to call. ``tool_executor.offload`` checks ``TOOL_RESULT_CACHE``
+before running a tool and awaits a matching prefetch, even one still in
+flight. Hit rate and the share of prefetches that were ever used show
+whether the speculation pays for itself.
+"""
+
+from __future__ import annotations
+
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from chatbot.answer_cache import student_ids
+from chatbot.configs import PREFETCH_MAX_CALLS, PREFETCH_MAX_ENTRIES, PREFETCH_TTL_SECONDS, PREFETCH_WORKERS
+from chatbot.datasets import current_tenant, load_map, register_reload_hook, run_for_tenant, use_tenant
+from chatbot.memory import SESSION_MEMORY, SessionMemory
+from chatbot.tools import (
+    TOOL_DATASETS,
+    check_student_results,
+    get_class_timetable,
+    get_my_exams,
+    query_exam_schedule,
+)
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, Any], ...]]
+Prediction = Tuple[Callable[..., Any], Dict[str, Any]]
+
+# Words in the current question that make a tool the likeliest next call.
+TOOL_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "get_class_timetable": ("timetable", "class", "schedule", "lecture"),
+    "check_student_results": ("result", "marks", "sgpa", "grade"),
+    "get_my_exams": ("exam",),
+    "query_exam_schedule": ("exam", "datesheet"),
+}
+# Order used when the question gives no hint.
+DEFAULT_ORDER = ("get_class_timetable", "check_student_results", "get_my_exams", "query_exam_schedule")
+
+
+def canonical_args(func: Callable[..., Any], kwargs: Mapping[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """Bind ``kwargs`` to ``func`` with defaults filled in, so equal calls compare equal."""
+    bound = inspect.signature(func).bind(**{key: value for key, value in kwargs.items() if key != "tool_context"})
+    bound.apply_defaults()
+    return tuple(sorted(bound.arguments.items()))
+
+
+@dataclass
+class PrefetchEntry:
+    tenant: str
+    future: Future
+    datasets: FrozenSet[str]
+    created: float
+    used: bool = False
+
+
+class ToolResultCache:
+    """Prefetched tool results keyed by tenant, tool name and bound arguments."""
+
+    def __init__(self, ttl_seconds: float = PREFETCH_TTL_SECONDS, max_entries: int = PREFETCH_MAX_ENTRIES) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, PrefetchEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+    @staticmethod
+    def key(tenant_id: str, func: Callable[..., Any], kwargs: Mapping[str, Any]) -> Optional[CacheKey]:
+        try:
+            return tenant_id, func.__name__, canonical_args(func, kwargs)
+        except TypeError:  # arguments that do not bind can never match
+            return None
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        if not entry.used:
+            self.wasted += 1
+
+    def __contains__(self, key: CacheKey) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry.created <= self.ttl_seconds
+
+    def submit(self, key: CacheKey, pool: ThreadPoolExecutor, func: Callable[..., Any], kwargs: Dict[str, Any]) -> None:
+        """Start ``func(**kwargs)`` for the key's tenant unless it is already cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created <= self.ttl_seconds:
+                return
+            if entry is not None:
+                self._drop(key)
+            future = pool.submit(run_for_tenant, key[0], func, kwargs)
+            self._entries[key] = PrefetchEntry(
+                tenant=key[0],
+                future=future,
+                datasets=TOOL_DATASETS.get(func.__name__, frozenset()),
+                created=time.monotonic(),
+            )
+            self.issued += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def lookup(self, tenant_id: str, func: Callable[..., Any], kwargs: Mapping[str, Any]) -> Optional[Future]:
+        """Return the prefetch for this exact call, finished or not, if any.
+
+        Only tools that prefetching covers count towards hits and misses.
+        """
+        if func.__name__ not in TOOL_KEYWORDS:
+            return None
+        key = self.key(tenant_id, func, kwargs)
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is not None and time.monotonic() - entry.created > self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            if entry is None or (entry.future.done() and entry.future.exception() is not None):
+                self.misses += 1
+                return None
+            entry.used = True
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.future
+
+    def invalidate(self, tenant_id: str, datasets: FrozenSet[str]) -> int:
+        """Drop a tenant's entries that read any of ``datasets``."""
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if entry.tenant == tenant_id and entry.datasets & datasets
+            ]
+            for key in stale:
+                self._drop(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            used = sum(entry.used for entry in self._entries.values())
+            pending = len(self._entries) - used
+        lookups = self.hits + self.misses
+        settled = self.issued - pending
+        return {
+            "prefetch_issued": self.issued,
+            "prefetch_hits": self.hits,
+            "prefetch_misses": self.misses,
+            "prefetch_wasted": self.wasted,
+            "prefetch_hit_rate": self.hits / lookups if lookups else 0.0,
+            # Share of settled prefetches that served at least one call.
+            "prefetch_precision": (settled - self.wasted) / settled if settled else 0.0,
+        }
+
+
+TOOL_RESULT_CACHE = ToolResultCache()
+
+
+class Prefetcher:
+    """Predict the next tool calls from session history and warm the cache."""
+
+    def __init__(
+        self,
+        cache: ToolResultCache = TOOL_RESULT_CACHE,
+        memory: SessionMemory = SESSION_MEMORY,
+        max_calls: int = PREFETCH_MAX_CALLS,
+        workers: int = PREFETCH_WORKERS,
+    ) -> None:
+        self.cache = cache
+        self.memory = memory
+        self.max_calls = max_calls
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Separate from the tool pool so speculation never delays real calls.
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="academate-prefetch")
+        return self._pool
+
+    def latest_student(self, session_id: str) -> Optional[str]:
+        """Return the most recently mentioned student ID in the session."""
+        for message in reversed(self.memory.get_history(session_id)):
+            ids = student_ids(message["content"])
+            if ids:
+                return ids[-1] if len(ids) == 1 else None
+        return None
+
+    def predict(self, session_id: str, question: str = "") -> List[Prediction]:
+        """Return likely next tool calls, best first, for the current tenant."""
+        student_id = self.latest_student(session_id)
+        if student_id is None:
+            return []
+        student = load_map("students", "student_id").get(student_id)
+        if student is None:
+            return []
+
+        candidates: Dict[str, Prediction] = {
+            "get_class_timetable": (get_class_timetable, {"student_id": student_id}),
+            "check_student_results": (check_student_results, {"student_id": student_id}),
+            "get_my_exams": (get_my_exams, {"student_id": student_id}),
+            "query_exam_schedule": (
+                query_exam_schedule,
+                {"department": student["department"], "semester": int(student["semester"])},
+            ),
+        }
+        text = question.casefold()
+        hinted = [name for name in DEFAULT_ORDER if any(word in text for word in TOOL_KEYWORDS[name])]
+        ranked = hinted + [name for name in DEFAULT_ORDER if name not in hinted]
+        return [candidates[name] for name in ranked]
+
+    def prefetch(self, session_id: str, question: str = "", tenant_id: Optional[str] = None) -> int:
+        """Start up to ``max_calls`` likely tool calls in the background; return how many."""
+        tenant_id = tenant_id or current_tenant()
+        with use_tenant(tenant_id):
+            predictions = self.predict(session_id, question)
+        started = 0
+        for func, kwargs in predictions[: self.max_calls]:
+            key = self.cache.key(tenant_id, func, kwargs)
+            if key is None or key in self.cache:
+                continue
+            self.cache.submit(key, self._executor(), func, kwargs)
+            started += 1
+        return started
+
+
+PREFETCHER = Prefetcher()
+
+
+@register_reload_hook
+def _on_reload(names: FrozenSet[str]) -> None:
+    TOOL_RESULT_CACHE.invalidate(current_tenant(), names)
+
+
+__all__ = [
+    "PREFETCHER",
+    "TOOL_RESULT_CACHE",
+    "Prefetcher",
+    "ToolResultCache",
+    "canonical_args",
+]
@@ -3,40 +3,85 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Iterable, Optional, Tuple
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
+from google.adk.models.base_llm import BaseLlm
 from google.adk.runners import InMemoryRunner
+from google.genai import types as genai_types
 
-from chatbot.configs import AGENT_METADATA, MODEL_NAME, SYSTEM_INSTRUCTION, TEMPERATURE
-from chatbot.llm import build_llm
-from chatbot.tools import get_all_tools
+from chatbot.answer_cache import ANSWER_CACHE, student_ids
+from chatbot.configs import (
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    AGENT_METADATA,
+    MODEL_NAME,
+    PREFETCH_ENABLED,
+    SYSTEM_INSTRUCTION,
+    TEMPERATURE,
+    TENANT_ID,
+    TURN_DEADLINE_SECONDS,
+)
+from chatbot.datasets import apply_deltas, current_tenant, run_for_tenant, set_tenant
+from chatbot.llm import CascadeLlm, build_llm
+from chatbot.prefetch import PREFETCHER, TOOL_RESULT_CACHE
+from chatbot.tool_executor import offload, offload_tools
+from chatbot.tools import check_student_results, get_all_tools, get_class_timetable, get_my_exams
 from chatbot.memory import SESSION_MEMORY
 from chatbot.observability import get_logger
 
 
-def build_agent(tools: Optional[Iterable] = None) -> LlmAgent:
-    """Return a configured Academate agent."""
+async def _poll_deltas(callback_context: CallbackContext) -> None:
+    """Apply new delta files for the session's tenant before each turn.
+
+    Runs for every entry point, ADK Web included, on a worker thread so a
+    results release does not stall the event loop.
+    """
+    tenant_id = callback_context.state.get("tenant_id") or current_tenant()
+    try:
+        await asyncio.to_thread(run_for_tenant, tenant_id, apply_deltas, {})
+    except KeyError:
+        pass  # unknown campus; the tools tell the user
+
+
+def build_agent(tools: Optional[Iterable] = None, model: Optional[BaseLlm] = None) -> LlmAgent:
+    """Return a configured Academate agent (``model`` defaults to ``build_llm()``).
+
+    Plain function tools are wrapped so they run off the event loop, and
+    dataset deltas are picked up before every turn.
+    """
     return LlmAgent(
         name=AGENT_METADATA["name"],
-        model=build_llm(),
+        model=model or build_llm(),
         description=AGENT_METADATA["description"],
         instruction=SYSTEM_INSTRUCTION,
-        tools=list(tools or []),
+        tools=offload_tools(tools or []),
+        before_agent_callback=_poll_deltas,
     )
 
 
-def build_agent_bundle(tools: Optional[Iterable] = None) -> Tuple[LlmAgent, InMemoryRunner]:
+def build_agent_bundle(
+    tools: Optional[Iterable] = None, model: Optional[BaseLlm] = None
+) -> Tuple[LlmAgent, InMemoryRunner]:
     """Return both the agent and an in-memory runner."""
     selected_tools = list(tools or get_all_tools())
-    agent = build_agent(selected_tools)
+    agent = build_agent(selected_tools, model=model)
     runner = InMemoryRunner(agent=agent)
     return agent, runner
 
 
-def build_runner(tools: Optional[Iterable] = None) -> InMemoryRunner:
+def build_runner(tools: Optional[Iterable] = None, model: Optional[BaseLlm] = None) -> InMemoryRunner:
     """Bind the agent to an in-memory runner for quick experiments."""
-    _, runner = build_agent_bundle(tools)
+    _, runner = build_agent_bundle(tools, model=model)
     return runner
 
 
@@ -45,9 +90,315 @@ def get_agent() -> LlmAgent:
     return build_agent(get_all_tools())
 
 
+CLI_USER_ID = "cli-user"
+STREAMING_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
+
+@dataclass
+class TurnResult:
+    """Final answer and latency figures for one chat turn."""
+
+    response: str
+    time_to_first_token: Optional[float]
+    total_latency: float
+    tool_calls: List[Tuple[str, Dict[str, object]]] = field(default_factory=list)
+
+
+def _event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text and not part.thought)
+
+
+async def stream_turn(
+    runner: InMemoryRunner,
+    session_id: str,
+    message: str,
+    on_text: Callable[[str], None],
+    user_id: str = CLI_USER_ID,
+) -> TurnResult:
+    """Run one turn on the runner's event stream, passing text to ``on_text`` as it arrives."""
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    streamed = []
+    response = ""
+    tool_calls: List[Tuple[str, Dict[str, object]]] = []
+
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=genai_types.Content(role="user", parts=[genai_types.Part(text=message)]),
+        run_config=STREAMING_CONFIG,
+    ):
+        if not event.partial:
+            tool_calls.extend((call.name, dict(call.args or {})) for call in event.get_function_calls())
+        text = _event_text(event)
+        if not text:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+
+        if event.partial:
+            streamed.append(text)
+            on_text(text)
+            continue
+        if event.is_final_response():
+            # The closing event repeats the streamed chunks in full; only print
+            # it when the model did not stream anything.
+            if not streamed:
+                on_text(text)
+            response = text
+        streamed = []
+
+    return TurnResult(
+        response=response or "".join(streamed),
+        time_to_first_token=first_token,
+        total_latency=time.perf_counter() - started,
+        tool_calls=tool_calls,
+    )
+
+
+async def record_turn(
+    runner: InMemoryRunner, session_id: str, message: str, response: str, user_id: str = CLI_USER_ID
+) -> None:
+    """Add a turn answered without the runner to its session, so follow-ups keep the context."""
+    service = runner.session_service
+    session = await service.get_session(app_name=runner.app_name, user_id=user_id, session_id=session_id)
+    if session is None:
+        return
+    invocation_id = Event.new_id()
+    for author, role, text in (("user", "user", message), (runner.agent.name, "model", response)):
+        await service.append_event(
+            session,
+            Event(
+                invocation_id=invocation_id,
+                author=author,
+                content=genai_types.Content(role=role, parts=[genai_types.Part(text=text)]),
+            ),
+        )
+
+
+async def read_line(prompt: str) -> str:
+    """Read a console line on a daemon thread so the event loop keeps running."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _settle(setter: Callable, value) -> None:
+        if not future.done():
+            setter(value)
+
+    def _worker() -> None:
+        try:
+            line = input(prompt)
+        except Exception as exc:  # EOFError on Ctrl-D, closed stdin, ...
+            loop.call_soon_threadsafe(_settle, future.set_exception, exc)
+        else:
+            loop.call_soon_threadsafe(_settle, future.set_result, line)
+
+    threading.Thread(target=_worker, name="academate-stdin", daemon=True).start()
+    return await future
+
+
+PRIORITY_STAFF = 0
+PRIORITY_STUDENT = 1
+PRIORITY_BULK = 2
+BUSY_MESSAGE = "Academate is busy right now. Please try again in a minute."
+
+Fallback = Callable[[], Awaitable[Optional[str]]]
+
+# Student-ID questions that can be answered straight from a tool when the model is overloaded.
+# The tools are offloaded like the agent's own, so shedding under load never blocks the loop.
+FAST_PATH_ROUTES: Tuple[Tuple[Tuple[str, ...], Callable[..., Awaitable[object]]], ...] = (
+    (("result", "marks", "sgpa", "grade"), offload(check_student_results)),
+    (("exam",), offload(get_my_exams)),
+    (("timetable", "class", "schedule"), offload(get_class_timetable)),
+)
+
+
+async def fast_path_answer(query: str) -> Optional[str]:
+    """Answer a single-student lookup without the model, or return ``None``."""
+    ids = student_ids(query)
+    if len(ids) != 1:
+        return None
+    text = query.casefold()
+    for keywords, tool in FAST_PATH_ROUTES:
+        if any(keyword in text for keyword in keywords):
+            reply = await tool(student_id=ids[0])
+            # Timeouts and tenant errors come back as dicts; the busy reply covers those.
+            return reply if isinstance(reply, str) else None
+    return None
+
+
+@dataclass
+class AdmissionResult:
+    """Outcome of a request that went through admission control."""
+
+    admitted: bool
+    value: object = None
+    reply: Optional[str] = None
+    shed_reason: Optional[str] = None
+    waited: float = 0.0
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    deadline: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    """Bounded priority queue in front of model turns with deadline-aware shedding.
+
+    Lower ``priority`` values go first. A request is shed straight away when
+    the queue is full of equal or more urgent work, or when the estimated
+    wait plus service time already misses its deadline. A queued request is
+    shed as soon as its deadline minus the service estimate passes. Admitted
+    work that overruns its deadline is cancelled. Shed requests get the
+    ``fallback`` answer when it has one, otherwise ``BUSY_MESSAGE``.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        initial_service_estimate: float = 5.0,
+        smoothing: float = 0.2,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.smoothing = smoothing
+        self.service_estimate = initial_service_estimate
+        self.counters: Counter = Counter()
+        self._waiters: List[_Waiter] = []
+        self._in_flight = 0
+        self._sequence = itertools.count()
+
+    def _expected_wait(self, priority: int) -> float:
+        ahead = sum(1 for waiter in self._waiters if waiter.priority <= priority)
+        backlog = self._in_flight + ahead - self.max_concurrency + 1
+        return max(0, backlog) * self.service_estimate / self.max_concurrency
+
+    def _observe(self, elapsed: float) -> None:
+        self.service_estimate += self.smoothing * (elapsed - self.service_estimate)
+
+    async def _shed(self, reason: str, fallback: Optional[Fallback], waited: float) -> AdmissionResult:
+        self.counters["shed"] += 1
+        self.counters[f"shed_{reason}"] += 1
+        reply = await fallback() if fallback else None
+        if reply:
+            self.counters["fast_path"] += 1
+        return AdmissionResult(
+            admitted=False, reply=reply or BUSY_MESSAGE, shed_reason=reason, waited=waited
+        )
+
+    def _release(self, now: float) -> None:
+        self._in_flight -= 1
+        while self._waiters and self._in_flight < self.max_concurrency:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+            if now + self.service_estimate > waiter.deadline:
+                waiter.future.set_result("deadline")
+                continue
+            self._in_flight += 1
+            waiter.future.set_result(None)
+
+    async def submit(
+        self,
+        work: Callable[[], Awaitable[object]],
+        priority: int = PRIORITY_STUDENT,
+        timeout: float = TURN_DEADLINE_SECONDS,
+        fallback: Optional[Fallback] = None,
+    ) -> AdmissionResult:
+        """Run ``work`` once a slot is free, or shed it if the deadline cannot be met."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + timeout
+        self.counters["submitted"] += 1
+
+        if started + self._expected_wait(priority) + self.service_estimate > deadline:
+            return await self._shed("deadline", fallback, 0.0)
+
+        if self._in_flight >= self.max_concurrency or self._waiters:
+            if len(self._waiters) >= self.max_queue:
+                worst = max(self._waiters, default=None)
+                if worst is None or worst.priority <= priority:
+                    return await self._shed("queue_full", fallback, 0.0)
+                self._waiters.remove(worst)
+                heapq.heapify(self._waiters)
+                worst.future.set_result("displaced")
+
+            waiter = _Waiter(priority, next(self._sequence), deadline, loop.create_future())
+            heapq.heappush(self._waiters, waiter)
+            try:
+                # Give up as soon as starting later could no longer finish in
+                # time, instead of waiting for a slot to free up to find out.
+                reason = await asyncio.wait_for(
+                    asyncio.shield(waiter.future),
+                    timeout=max(0.0, deadline - self.service_estimate - loop.time()),
+                )
+            except asyncio.TimeoutError:
+                if waiter.future.done():
+                    reason = waiter.future.result()  # settled just as the timer fired
+                else:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                    waiter.future.cancel()
+                    reason = "deadline"
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                    waiter.future.cancel()
+                elif waiter.future.done() and not waiter.future.cancelled() and waiter.future.result() is None:
+                    self._release(loop.time())
+                raise
+            if reason is not None:
+                return await self._shed(reason, fallback, loop.time() - started)
+        else:
+            self._in_flight += 1
+
+        admitted_at = loop.time()
+        timed_out = False
+        try:
+            value = await asyncio.wait_for(work(), timeout=max(0.0, deadline - admitted_at))
+        except asyncio.TimeoutError:
+            # The turn took at least until its deadline. Counting that keeps
+            # the estimate honest during provider outages, so later requests
+            # are shed up front instead of waiting out their own deadline.
+            timed_out = True
+        except Exception:
+            self._observe(loop.time() - admitted_at)
+            raise
+        finally:
+            self._release(loop.time())
+
+        self._observe(loop.time() - admitted_at)
+        if timed_out:
+            # The slot is already free, so the fast path does not hold up queued turns.
+            return await self._shed("timeout", fallback, admitted_at - started)
+        self.counters["completed"] += 1
+        return AdmissionResult(admitted=True, value=value, waited=admitted_at - started)
+
+    def metrics(self) -> Dict[str, float]:
+        """Queue depth, in-flight turns, and admission/shed counters."""
+        return {
+            "queue_depth": len(self._waiters),
+            "in_flight": self._in_flight,
+            "service_estimate_s": round(self.service_estimate, 3),
+            **self.counters,
+        }
+
+
+ADMISSION = AdmissionController()
+
+
 def run_cli() -> None:
     """Start a conversational loop similar to the capstone demo."""
     logger = get_logger()
+    set_tenant(TENANT_ID)
     print("=" * 60)
     print("🎓 ACADEMATE - College Helper")
     print("=" * 60)
@@ -57,15 +408,29 @@ def run_cli() -> None:
     tools = get_all_tools()
     agent, runner = build_agent_bundle(tools=tools)
     print(f" Agent loaded with {len(tools)} tools")
-    print(f" Model: {MODEL_NAME}")
+    print(f" Model: {agent.model.model if isinstance(agent.model, BaseLlm) else MODEL_NAME}")
     print(f"  Temperature: {TEMPERATURE}")
+    print(f"  Campus: {TENANT_ID}")
 
     session_id = "cli-session"
 
+    def _print_chunk(text: str) -> None:
+        print(text, end="", flush=True)
+
     async def _chat_loop():
+        await runner.session_service.create_session(
+            app_name=runner.app_name,
+            user_id=CLI_USER_ID,
+            session_id=session_id,
+            state={"tenant_id": TENANT_ID},
+        )
         while True:
             try:
-                user_input = input("\nYou: ").strip()
+                try:
+                    user_input = (await read_line("\nYou: ")).strip()
+                except EOFError:
+                    print("\n Bye!\n")
+                    break
 
                 if not user_input:
                     continue
@@ -74,11 +439,65 @@ def run_cli() -> None:
                     print("\n Bye!\n")
                     break
 
+                applied = apply_deltas()
+                if applied:
+                    logger.info("Applied dataset deltas", extra={"session": session_id, "rows": applied})
+
                 print("\n Academate: ", end="", flush=True)
                 SESSION_MEMORY.append(session_id, "user", user_input)
                 logger.info("User input", extra={"session": session_id, "text": user_input})
-                await runner.run_debug(user_input)
-                SESSION_MEMORY.append(session_id, "assistant", "Response streamed via run_debug")
+                cached = ANSWER_CACHE.lookup(user_input)
+                if cached is not None:
+                    print(cached)
+                    SESSION_MEMORY.append(session_id, "assistant", cached)
+                    await record_turn(runner, session_id, user_input, cached)
+                    logger.info("Answer cache hit", extra={"session": session_id, **ANSWER_CACHE.stats()})
+                    continue
+
+                if PREFETCH_ENABLED:
+                    PREFETCHER.prefetch(session_id, user_input)
+
+                admission = await ADMISSION.submit(
+                    lambda: stream_turn(runner, session_id, user_input, _print_chunk),
+                    priority=PRIORITY_STUDENT,
+                    fallback=lambda: fast_path_answer(user_input),
+                )
+                if not admission.admitted:
+                    print(admission.reply)
+                    SESSION_MEMORY.append(session_id, "assistant", admission.reply)
+                    logger.warning(
+                        "Turn shed (%s)",
+                        admission.shed_reason,
+                        extra={"session": session_id, **ADMISSION.metrics()},
+                    )
+                    continue
+
+                result = admission.value
+                print()
+                SESSION_MEMORY.append(session_id, "assistant", result.response)
+                ANSWER_CACHE.store(
+                    user_input,
+                    result.response,
+                    result.tool_calls,
+                    history=[message["content"] for message in SESSION_MEMORY.get_history(session_id)],
+                )
+                ttft_ms = result.time_to_first_token * 1000 if result.time_to_first_token is not None else -1
+                logger.info(
+                    "Turn latency ttft=%.0fms total=%.0fms",
+                    ttft_ms,
+                    result.total_latency * 1000,
+                    extra={
+                        "session": session_id,
+                        "ttft_ms": ttft_ms,
+                        "total_ms": result.total_latency * 1000,
+                        "queue_wait_ms": admission.waited * 1000,
+                        **ADMISSION.metrics(),
+                    },
+                )
+                if PREFETCH_ENABLED:
+                    logger.info("Prefetch stats", extra={"session": session_id, **TOOL_RESULT_CACHE.stats()})
+                if isinstance(agent.model, CascadeLlm):
+                    logger.info("Cascade stats", extra={"session": session_id, **agent.model.stats.snapshot()})
             except KeyboardInterrupt:
                 raise
             except Exception as exc:  
@@ -92,5 +511,21 @@ def run_cli() -> None:
         print("\n Bye!\n")
 
 
-__all__ = ["build_agent", "build_agent_bundle", "build_runner", "run_cli"]
+__all__ = [
+    "ADMISSION",
+    "AdmissionController",
+    "AdmissionResult",
+    "PRIORITY_BULK",
+    "PRIORITY_STAFF",
+    "PRIORITY_STUDENT",
+    "TurnResult",
+    "build_agent",
+    "build_agent_bundle",
+    "build_runner",
+    "fast_path_answer",
+    "read_line",
+    "record_turn",
+    "run_cli",
+    "stream_turn",
+]
 
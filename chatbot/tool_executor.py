@@ -0,0 +1,207 @@
+"""Run synchronous tools off the event loop with timeouts and concurrency caps.
+
+ADK calls plain functions directly on the event loop thread, so one slow CSV
+load stalls every session in the process. ``offload`` wraps a tool in an
+async function that runs it in a bounded thread pool. CPU-heavy tools can go
+to a process pool instead when ``TOOL_PROCESS_WORKERS`` is set. Each tool
+gets a timeout and a cap on concurrent calls. A call that times out returns a
+structured error to the model instead of hanging the turn.
+
+Calls run against the session's tenant: the wrapper asks ADK for the
+``tool_context`` and reads ``tenant_id`` from session state, falling back to
+the tenant of the calling context. A call that ``prefetch`` already
+started for the same tenant and arguments is awaited instead of rerun.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import multiprocessing
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from chatbot.configs import (
+    TOOL_MAX_CONCURRENCY,
+    TOOL_PROCESS_WORKERS,
+    TOOL_THREAD_WORKERS,
+    TOOL_TIMEOUT_SECONDS,
+)
+from chatbot.datasets import current_tenant, evict_tenant, register_reload_hook, run_for_tenant, tenant_data_dir
+from chatbot.prefetch import TOOL_RESULT_CACHE
+
+
+@dataclass(frozen=True)
+class ToolLimits:
+    """Timeout and concurrency settings for one tool."""
+
+    timeout: float = TOOL_TIMEOUT_SECONDS
+    max_concurrency: int = TOOL_MAX_CONCURRENCY
+    cpu_bound: bool = False
+
+
+DEFAULT_LIMITS = ToolLimits()
+TOOL_LIMITS: Dict[str, ToolLimits] = {
+    "get_cohort_analytics": ToolLimits(timeout=2 * TOOL_TIMEOUT_SECONDS, max_concurrency=2, cpu_bound=True),
+}
+
+_THREAD_POOL: Optional[ThreadPoolExecutor] = None
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Bumped per tenant on every dataset reload; process workers compare it with
+# the value they last saw and drop their copy of that tenant when it moved.
+_GENERATIONS: Dict[str, int] = {}
+_WORKER_GENERATIONS: Dict[str, int] = {}
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    global _THREAD_POOL
+    if _THREAD_POOL is None:
+        _THREAD_POOL = ThreadPoolExecutor(max_workers=TOOL_THREAD_WORKERS, thread_name_prefix="academate-tool")
+    return _THREAD_POOL
+
+
+def _process_pool() -> Optional[ProcessPoolExecutor]:
+    global _PROCESS_POOL
+    if TOOL_PROCESS_WORKERS <= 0:
+        return None
+    if _PROCESS_POOL is None:
+        # Forking now would copy whatever locks the tool and stdin threads
+        # hold into the child, so start workers from a clean process instead.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _PROCESS_POOL = ProcessPoolExecutor(
+            max_workers=TOOL_PROCESS_WORKERS, mp_context=multiprocessing.get_context(method)
+        )
+    return _PROCESS_POOL
+
+
+def _executor_for(limits: ToolLimits) -> Executor:
+    if limits.cpu_bound:
+        return _process_pool() or _thread_pool()
+    return _thread_pool()
+
+
+def _semaphore(name: str, limits: ToolLimits) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    per_loop = _SEMAPHORES.setdefault(loop, {})
+    if name not in per_loop:
+        per_loop[name] = asyncio.Semaphore(max(1, limits.max_concurrency))
+    return per_loop[name]
+
+
+def _run_in_worker(tenant_id: str, generation: int, func: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    seen = _WORKER_GENERATIONS.get(tenant_id)
+    if seen != generation:
+        if seen is not None:
+            evict_tenant(tenant_id)
+        _WORKER_GENERATIONS[tenant_id] = generation
+    return run_for_tenant(tenant_id, func, kwargs)
+
+
+def _session_tenant(tool_context: Any) -> str:
+    state = getattr(tool_context, "state", None)
+    tenant_id = state.get("tenant_id") if state is not None else None
+    return tenant_id or current_tenant()
+
+
+def timeout_error(name: str, timeout: float) -> Dict[str, str]:
+    return {
+        "status": "timeout",
+        "tool": name,
+        "error": f"{name} did not finish within {timeout:g} seconds. "
+        "Tell the user the data is slow to load right now and suggest trying again shortly.",
+    }
+
+
+def tenant_error(tenant_id: str) -> Dict[str, str]:
+    return {
+        "status": "error",
+        "error": f"No data is configured for campus '{tenant_id}'. Ask the user to contact the college office.",
+    }
+
+
+def offload(func: Callable[..., Any], limits: Optional[ToolLimits] = None) -> Callable[..., Any]:
+    """Return an async wrapper that keeps ``func``'s name, docstring, and signature.
+
+    The wrapper's signature gains a ``tool_context`` parameter, which ADK
+    fills in and leaves out of the declaration sent to the model.
+    """
+    if inspect.iscoroutinefunction(func):
+        return func
+
+    name = func.__name__
+    limits = limits or TOOL_LIMITS.get(name, DEFAULT_LIMITS)
+
+    @functools.wraps(func)
+    async def wrapper(tool_context: Any = None, **kwargs: Any) -> Any:
+        tenant_id = _session_tenant(tool_context)
+        try:
+            tenant_data_dir(tenant_id)
+        except KeyError:
+            return tenant_error(tenant_id)
+
+        prefetched = TOOL_RESULT_CACHE.lookup(tenant_id, func, kwargs) if TOOL_RESULT_CACHE.issued else None
+        if prefetched is not None:
+            try:
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(prefetched)), timeout=limits.timeout)
+            except asyncio.TimeoutError:
+                return timeout_error(name, limits.timeout)
+            except Exception:
+                pass  # the speculative run failed; make the real call below
+
+        loop = asyncio.get_running_loop()
+        semaphore = _semaphore(name, limits)
+        executor = _executor_for(limits)
+
+        def _finish(done: asyncio.Future) -> None:
+            semaphore.release()
+            if not done.cancelled():
+                done.exception()  # mark as retrieved when nobody is awaiting any more
+
+        async def _call() -> Any:
+            await semaphore.acquire()
+            try:
+                if isinstance(executor, ProcessPoolExecutor):
+                    generation = _GENERATIONS.get(tenant_id, 0)
+                    call = functools.partial(_run_in_worker, tenant_id, generation, func, kwargs)
+                else:
+                    call = functools.partial(run_for_tenant, tenant_id, func, kwargs)
+                future = loop.run_in_executor(executor, call)
+            except BaseException:
+                semaphore.release()
+                raise
+            # The slot frees when the work really ends, not when we stop
+            # waiting, so runaway calls still count against the cap.
+            future.add_done_callback(_finish)
+            return await asyncio.shield(future)
+
+        try:
+            return await asyncio.wait_for(_call(), timeout=limits.timeout)
+        except asyncio.TimeoutError:
+            return timeout_error(name, limits.timeout)
+
+    parameters = list(inspect.signature(func).parameters.values())
+    if "tool_context" not in {parameter.name for parameter in parameters}:
+        parameters.append(inspect.Parameter("tool_context", inspect.Parameter.KEYWORD_ONLY, default=None))
+    wrapper.__signature__ = inspect.signature(func).replace(parameters=parameters)  # type: ignore[attr-defined]
+    return wrapper
+
+
+def offload_tools(tools: Iterable[Callable[..., Any]]) -> List[Callable[..., Any]]:
+    """Wrap every plain function tool; leave async tools and tool objects alone."""
+    return [offload(tool) if inspect.isfunction(tool) else tool for tool in tools]
+
+
+@register_reload_hook
+def _on_reload(names: FrozenSet[str]) -> None:
+    tenant_id = current_tenant()
+    _GENERATIONS[tenant_id] = _GENERATIONS.get(tenant_id, 0) + 1
+
+
+__all__ = ["DEFAULT_LIMITS", "TOOL_LIMITS", "ToolLimits", "offload", "offload_tools", "tenant_error", "timeout_error"]
@@ -2,12 +2,32 @@
 from __future__ import annotations
 
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import Dict, FrozenSet, List, Optional
 
-from chatbot.datasets import load_rows, load_map
+from chatbot.analytics import GROUP_FIELDS, student_standing, summarize
+from chatbot.availability import FACULTY, ROOM, WEEK_DAYS, get_occupancy_index, slot_mask
+from chatbot.datasets import load_groups, load_map, load_rows
+from chatbot.exam_index import exams_for, find_clashes
 
 DATE_FMT = "%Y-%m-%d"
 
+# Datasets each tool reads, so cached answers can be dropped when they reload.
+# get_academic_calendar is left out on purpose: its answer depends on today's date.
+TOOL_DATASETS: Dict[str, FrozenSet[str]] = {
+    "query_exam_schedule": frozenset({"exam_schedule"}),
+    "fetch_previous_papers": frozenset({"previous_papers"}),
+    "get_class_timetable": frozenset({"students", "timetable"}),
+    "get_faculty_info": frozenset({"faculty"}),
+    "check_student_results": frozenset({"students", "student_results"}),
+    "get_cohort_analytics": frozenset({"students", "student_results"}),
+    "find_free_slots": frozenset({"timetable"}),
+    "get_my_exams": frozenset({"students", "exam_schedule", "student_results"}),
+}
+# Tools whose answer also depends on today's date, so the answer cache must not
+# replay them. get_my_exams stays in TOOL_DATASETS so prefetched lists still
+# expire when its datasets reload.
+DATE_DEPENDENT_TOOLS: FrozenSet[str] = frozenset({"get_academic_calendar", "get_my_exams"})
+
 
 def _casefold(value: Optional[str]) -> str:
     return (value or "").strip().casefold()
@@ -258,9 +278,8 @@ def check_student_results(
 
     results = [
         row
-        for row in load_rows("student_results")
-        if row["student_id"] == student_id
-        and (semester is None or int(row["semester"]) == int(semester))
+        for row in load_groups("student_results", "student_id").get(student_id, [])
+        if (semester is None or int(row["semester"]) == int(semester))
         and (academic_year is None or row["academic_year"] == academic_year)
     ]
 
@@ -313,6 +332,169 @@ def check_student_results(
     return "\n".join(lines).strip()
 
 
+def get_cohort_analytics(
+    department: Optional[str] = None,
+    semester: Optional[int] = None,
+    subject_code: Optional[str] = None,
+    academic_year: Optional[str] = None,
+    group_by: str = "subject_code",
+    student_id: Optional[str] = None,
+) -> str:
+    """Report class averages, pass rates, grade spread, and a student's cohort rank."""
+    fields = [_casefold(field) for field in (group_by or "").split(",") if field.strip()]
+    unknown = [field for field in fields if field not in GROUP_FIELDS]
+    if unknown:
+        return f"Cannot group by {', '.join(unknown)}. Use any of: {', '.join(GROUP_FIELDS)}."
+
+    if student_id:
+        students_map = load_map("students", "student_id")
+        if student_id not in students_map:
+            return f"Student {student_id} not found in the system."
+        department = department or students_map[student_id]["department"]
+
+    filters = {
+        "department": department,
+        "semester": semester,
+        "subject_code": subject_code,
+        "academic_year": academic_year,
+    }
+    stats = summarize(fields, **filters)
+    if not len(stats):
+        return "No results found for that cohort."
+
+    scope = ", ".join(f"{key.replace('_', ' ').title()}: {value}" for key, value in filters.items() if value)
+    lines = [" **Cohort Analytics**", scope or "All departments", ""]
+
+    for index in range(len(stats)):
+        label = " | ".join(
+            f"{key.replace('_', ' ').title()}: {stats.values[key][index]}" for key in stats.keys
+        )
+        lines.append(f" {label or 'Overall'}")
+        lines.append(
+            f" Results: {stats.count[index]} | Average: {stats.mean_percentage[index]:.2f}%"
+            f" | Pass Rate: {stats.pass_rate[index]:.1f}% | Avg Grade Points: {stats.mean_grade_points[index]:.2f}"
+        )
+        grade_text = ", ".join(
+            f"{grade}: {count}" for grade, count in zip(stats.grades, stats.grade_counts[index]) if count
+        )
+        lines.append(f" Grades: {grade_text}")
+        lines.append("")
+
+    if student_id:
+        standing = student_standing(student_id, **filters)
+        if standing is None:
+            lines.append(f"No results for student {student_id} in this cohort.")
+        else:
+            lines.append(
+                f"Standing for {student_id}: rank {standing.rank} of {standing.cohort_size}"
+                f" ({standing.percentage:.2f}%, percentile {standing.percentile:.0f})"
+            )
+
+    return "\n".join(lines).strip()
+
+
+def find_free_slots(
+    week_day: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    room: Optional[str] = None,
+    faculty_name: Optional[str] = None,
+    show_conflicts: bool = False,
+) -> str:
+    """Find free rooms for a time window, or free hours for a room or faculty member.
+
+    Times use 24-hour HH:MM. Without a room or faculty name, lists rooms free
+    for the whole window on ``week_day``. Set ``show_conflicts`` to list rooms
+    and faculty that are double-booked in the timetable instead.
+    """
+    index = get_occupancy_index()
+    if show_conflicts:
+        clashes = [
+            (kind, name, day)
+            for kind, name, day in index.conflicts()
+            if not week_day or _casefold(day) == _casefold(week_day)
+        ]
+        if not clashes:
+            return "No double bookings found in the timetable."
+        lines = ["Timetable Conflicts", ""]
+        lines.extend(f"  {day}: {kind} {name} is double-booked" for kind, name, day in clashes)
+        return "\n".join(lines).strip()
+
+    days = [_casefold(week_day)] if week_day else list(WEEK_DAYS)
+    unknown_days = [day for day in days if day not in WEEK_DAYS]
+    if unknown_days:
+        return f"Unknown day '{week_day}'. Use a weekday name such as Tuesday."
+
+    window = None
+    if start_time or end_time:
+        if not (start_time and end_time):
+            return "Please provide both start_time and end_time (HH:MM)."
+        try:
+            window = slot_mask(start_time, end_time)
+        except ValueError:
+            return "Times must look like HH:MM, for example 14:00."
+        if not window:
+            return f"{start_time} - {end_time} is outside teaching hours."
+
+    if room or faculty_name:
+        kind, query = (ROOM, room) if room else (FACULTY, faculty_name)
+        names = index.match(kind, query)
+        if not names:
+            return f"No timetable entries found for {kind} '{query}'."
+
+        lines = [f"Availability – {query}", ""]
+        for name in names:
+            lines.append(f"**{name}**")
+            for day in days:
+                if window is not None:
+                    status = "free" if index.is_free(kind, name, day, window) else "busy"
+                    lines.append(f"  {day.title()} {start_time} - {end_time}: {status}")
+                else:
+                    free = ", ".join(f"{start} - {end}" for start, end in index.free_windows(kind, name, day))
+                    lines.append(f"  {day.title()}: {free or 'no free time'}")
+            lines.append("")
+        return "\n".join(lines).strip()
+
+    if not week_day or window is None:
+        return "Please provide week_day, start_time and end_time, or a room or faculty_name."
+
+    rooms = index.free_rooms(week_day, window)
+    if not rooms:
+        return f"No rooms are free on {week_day.title()} {start_time} - {end_time}."
+    lines = [f"Free Rooms – {week_day.title()} {start_time} - {end_time}", ""]
+    lines.extend(f"  {name}" for name in rooms)
+    return "\n".join(lines).strip()
+
+
+def get_my_exams(student_id: str, include_past: bool = False) -> str:
+    """List the exams a student still has to sit, including backlog papers, and flag clashes."""
+    entries = exams_for(student_id)
+    if entries is None:
+        return f"Student {student_id} not found in the system."
+    if not include_past:
+        today = date.today()
+        entries = tuple(entry for entry in entries if entry.starts.date() >= today)
+    if not entries:
+        return f"No upcoming exams found for student {student_id}."
+
+    lines = [" **My Exams**", f"Student: {student_id}", ""]
+    for entry in entries:
+        exam = entry.row
+        suffix = " – backlog" if entry.backlog else ""
+        lines.append(f" {entry.label}{suffix}")
+        lines.append(f" Date: {entry.starts.strftime('%d %B %Y')} | Time: {exam['exam_time']}")
+        lines.append(f" Room: {exam['room_number']} | Type: {exam['exam_type']}")
+        lines.append("")
+
+    for clash in find_clashes(student_id, entries):
+        lines.append(
+            f"Warning: {clash.first.label} and {clash.second.label} "
+            f"{'overlap' if clash.kind == 'overlap' else 'are on the same day'}."
+        )
+
+    return "\n".join(lines).strip()
+
+
 def get_all_tools() -> List:
     """Return the full list of callable tools."""
     return [
@@ -322,6 +504,9 @@ def get_all_tools() -> List:
         get_faculty_info,
         get_academic_calendar,
         check_student_results,
+        get_cohort_analytics,
+        find_free_slots,
+        get_my_exams,
     ]
 
 
@@ -332,5 +517,10 @@ __all__ = [
     "get_faculty_info",
     "get_academic_calendar",
     "check_student_results",
+    "get_cohort_analytics",
+    "find_free_slots",
+    "get_my_exams",
     "get_all_tools",
+    "DATE_DEPENDENT_TOOLS",
+    "TOOL_DATASETS",
 ]